@@ -27,6 +27,12 @@ config = context.config
 from app.database import DATABASE_URL
 config.set_main_option('sqlalchemy.url', DATABASE_URL)
 
+# the directory holding backend/, migrations import backend.utils (like the app, fastapi run adds it for app/main.py)
+import os, sys
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
 
 
 # Interpret the config file for Python logging.
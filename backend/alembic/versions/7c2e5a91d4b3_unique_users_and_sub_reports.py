@@ -0,0 +1,85 @@
+"""dedupe users and sub_reports, unique natural keys for insert_or_get
+
+Revision ID: 7c2e5a91d4b3
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e5a91d4b3'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# every duplicate row -> the row it's merged into (lowest id of its natural key),
+# NULL keys never conflict in a unique index, so they're left alone
+USER_DUPES = """
+    SELECT u.id AS dupe_id, (
+        SELECT k.id FROM users k
+        WHERE k.name = u.name AND k.dob = u.dob AND k.gender = u.gender
+        ORDER BY k.id LIMIT 1
+    ) AS keep_id
+    FROM users u
+    WHERE EXISTS (
+        SELECT 1 FROM users o
+        WHERE o.name = u.name AND o.dob = u.dob AND o.gender = u.gender AND o.id < u.id
+    )
+"""
+
+SUB_REPORT_DUPES = """
+    SELECT s.id AS dupe_id, (
+        SELECT k.id FROM sub_reports k
+        WHERE k.dob = s.dob AND k.gender = s.gender
+        ORDER BY k.id LIMIT 1
+    ) AS keep_id
+    FROM sub_reports s
+    WHERE EXISTS (
+        SELECT 1 FROM sub_reports o
+        WHERE o.dob = s.dob AND o.gender = s.gender AND o.id < s.id
+    )
+"""
+
+
+def merge_duplicates(table, dupes, references):
+    """Repoints every (table, column) in references from the duplicates to the kept row, then deletes the duplicates."""
+    for ref_table, column in references:
+        op.execute(f"""
+            WITH dupes AS ({dupes})
+            UPDATE {ref_table} SET {column} = (SELECT keep_id FROM dupes WHERE dupe_id = {ref_table}.{column})
+            WHERE {column} IN (SELECT dupe_id FROM dupes)
+        """)
+    op.execute(f"DELETE FROM {table} WHERE id IN (SELECT dupe_id FROM ({dupes}) AS dupes)")
+
+
+def create_unique_index(name, table, columns):
+    # databases created by create_all after the models got the index already have it
+    if name not in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}:
+        op.create_index(name, table, columns, unique=True)
+
+
+def upgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    # a new database has no tables yet, create_all (app startup) creates them with the indexes
+    if "users" in tables:
+        merge_duplicates("users", USER_DUPES, [
+            ("numerology_reports", "user_id"),
+            ("compatibility_reports", "user1_id"),
+            ("compatibility_reports", "user2_id"),
+        ])
+        create_unique_index("uq_users_person", "users", ["name", "dob", "gender"])
+    if "sub_reports" in tables:
+        merge_duplicates("sub_reports", SUB_REPORT_DUPES, [("numerology_reports", "sub_report_id")])
+        create_unique_index("uq_sub_reports_dob_gender", "sub_reports", ["dob", "gender"])
+
+
+def downgrade() -> None:
+    # merged rows aren't split again
+    op.drop_index("uq_sub_reports_dob_gender", table_name="sub_reports")
+    op.drop_index("uq_users_person", table_name="users")
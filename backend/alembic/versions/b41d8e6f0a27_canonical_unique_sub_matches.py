@@ -0,0 +1,93 @@
+"""canonical order and dedupe for sub_matches, unique pair key
+
+Revision ID: b41d8e6f0a27
+Revises: 7c2e5a91d4b3
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d8e6f0a27'
+down_revision: Union[str, None] = '7c2e5a91d4b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+sub_matches = sa.table(
+    "sub_matches",
+    sa.column("id", UUID(as_uuid=True)), sa.column("match_data", JSONB),
+    sa.column("dob1", sa.String), sa.column("gender1", sa.String),
+    sa.column("dob2", sa.String), sa.column("gender2", sa.String),
+)
+compatibility_reports = sa.table(
+    "compatibility_reports", sa.column("sub_match_id", UUID(as_uuid=True)),
+)
+
+
+def flipped_match_data(match_data):
+    """match_data seen from the other person, stored format (compact or the older full one) is kept."""
+    # the mulank scores come from the numerology data tables, importable through env.py's sys.path
+    from backend.utils.Numerology import get_mulank_score_lut, swap_match_data
+
+    if not match_data:
+        return match_data
+    if "kb_version" not in match_data:
+        return swap_match_data(match_data)
+    person1, person2 = match_data["person1"], match_data["person2"]
+    # every score but mulank is symmetric
+    scores = dict(match_data["scores"], mulank=get_mulank_score_lut()[person2["mulank"]][person1["mulank"]])
+    return dict(match_data, person1=person2, person2=person1, scores=scores)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # a new database has no tables yet, create_all (app startup) creates it with the index
+    if "sub_matches" not in sa.inspect(bind).get_table_names():
+        return
+
+    # canonical pair (same ordering as controllers.canonical_pair) -> [(reversed, id)]
+    pairs = {}
+    rows = bind.execute(sa.select(
+        sub_matches.c.id, sub_matches.c.dob1, sub_matches.c.gender1, sub_matches.c.dob2, sub_matches.c.gender2
+    ))
+    for id, dob1, gender1, dob2, gender2 in rows:
+        if None in (dob1, gender1, dob2, gender2):
+            continue  # NULLs never conflict in the unique index
+        reversed_ = (dob2, gender2) < (dob1, gender1)
+        pair = (dob2, gender2, dob1, gender1) if reversed_ else (dob1, gender1, dob2, gender2)
+        pairs.setdefault(pair, []).append((reversed_, id))
+
+    for (dob1, gender1, dob2, gender2), rows in pairs.items():
+        # a row already in canonical order is kept when there is one,
+        # reports of the others are repointed (their orientation follows the users, see build_match_response)
+        rows.sort()
+        (keep_reversed, keep_id), dupe_ids = rows[0], [id for _, id in rows[1:]]
+        if dupe_ids:
+            op.execute(
+                compatibility_reports.update()
+                .where(compatibility_reports.c.sub_match_id.in_(dupe_ids))
+                .values(sub_match_id=keep_id)
+            )
+            op.execute(sub_matches.delete().where(sub_matches.c.id.in_(dupe_ids)))
+        if keep_reversed:
+            match_data = bind.scalar(sa.select(sub_matches.c.match_data).where(sub_matches.c.id == keep_id))
+            op.execute(
+                sub_matches.update().where(sub_matches.c.id == keep_id).values(
+                    dob1=dob1, gender1=gender1, dob2=dob2, gender2=gender2,
+                    match_data=flipped_match_data(match_data)
+                )
+            )
+
+    if "uq_sub_matches_pair" not in {index["name"] for index in sa.inspect(bind).get_indexes("sub_matches")}:
+        op.create_index("uq_sub_matches_pair", "sub_matches", ["dob1", "gender1", "dob2", "gender2"], unique=True)
+
+
+def downgrade() -> None:
+    # flipped / merged rows stay as they are
+    op.drop_index("uq_sub_matches_pair", table_name="sub_matches")
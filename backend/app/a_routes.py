@@ -1,13 +1,13 @@
 
 # a_routes.py
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from fastapi.responses import JSONResponse
 
 from .limiter import limiter
 from .schemas import LocationRequest ,AuthUserCreate , UpdateProfile, AuthUser
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from .database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from .database import get_async_db
 from .authorization import auth0_user_dependency
 from .jwt import create_jwt_token
 from .config import GEO_API_KEY
@@ -57,15 +57,15 @@ router = APIRouter()
 
 @router.put("/edit/profile")
 @limiter.limit("6/minute")
-async def update_profile(request: Request, userdata : UpdateProfile, auth0_user: Auth0User = Depends(auth0_user_dependency), db: Session = Depends(get_db)):
+async def update_profile(request: Request, userdata : UpdateProfile, auth0_user: Auth0User = Depends(auth0_user_dependency), db: AsyncSession = Depends(get_async_db)):
     """ Updates profile picture. """
     # print(vars(auth0_user))
     # print(userdata)
-    user = db.query(AuthUser).filter(AuthUser.auth0_id == auth0_user.id).first()
+    user = (await db.scalars(select(AuthUser).filter(AuthUser.auth0_id == auth0_user.id))).first()
     if not user:
         raise HTTPException(status_code=404, detail="User Not Found.")
     user.picture = userdata.picture
-    db.commit()
+    await db.commit()
     return {"picture" : user.picture}
  
 
@@ -75,12 +75,12 @@ async def update_location(
     request: Request,
     location_data: LocationRequest,  # The input data (lat, lon, address)
     auth0_user: Auth0User = Depends(auth0_user_dependency),  
-    db: Session = Depends(get_db) 
+    db: AsyncSession = Depends(get_async_db) 
 ):
     """ Updates address and location for the user. """
     # print(location_data)
     # Retrieve the user based on Auth0 ID
-    user = db.query(AuthUser).filter(AuthUser.auth0_id == auth0_user.id).first()
+    user = (await db.scalars(select(AuthUser).filter(AuthUser.auth0_id == auth0_user.id))).first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User Not Found.")
@@ -98,20 +98,22 @@ async def update_location(
         # print(location_data.clean_dump())
         
         user.address = location_data.clean_dump()  # Only includes provided fields
+        address = user.address
 
-        db.commit()
+        await db.commit()
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(e)
         raise HTTPException(status_code=500, detail=f"Failed to save location: {str(e)}")
      
-    return {"message": "Location updated successfully", "address": user.address}
+    return {"message": "Location updated successfully", "address": address}
 
 
 # to authenticate the all reports and return thier new tokens for each,
 
 
+from typing import Optional
 from .controllers import get_report_setAuth
 from .schemas import SavedReportIDs
 
@@ -120,8 +122,22 @@ from .schemas import SavedReportIDs
 async def get_token_report(
     request: Request,
     data: SavedReportIDs, 
+    limit: Optional[int] = Query(None, ge=1, le=100),  # all created reports unless a page is asked for
+    offset: int = Query(0, ge=0),
     auth0_user: Auth0User = Depends(auth0_user_dependency),  
-    db: Session = Depends(get_db) 
+    db: AsyncSession = Depends(get_async_db) 
 ):
-    return await get_report_setAuth(auth0_user,data, db)
- 
\ No newline at end of file
+    return await get_report_setAuth(auth0_user,data, db, limit, offset)
+ 
+
+from .controllers import get_friends_group_compatibility
+
+@router.get("/match/group")
+@limiter.limit("4/minute")
+async def get_friends_group_match(
+    request: Request,
+    auth0_user: Auth0User = Depends(auth0_user_dependency),  
+    db: AsyncSession = Depends(get_async_db) 
+):
+    """ Compatibility matrix of the user and all their friends. """
+    return await get_friends_group_compatibility(auth0_user, db)
\ No newline at end of file
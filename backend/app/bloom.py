@@ -0,0 +1,190 @@
+# bloom.py
+"""
+Bloom filters of the existing report and match ids, ids they don't contain are answered with 404
+without touching the database. The bits live in Redis (one bitmap per filter, SETBIT / GETBIT),
+so every worker sees the ids inserted by the others. Rebuilt from the id columns when Redis doesn't
+have a complete one (startup, flush, eviction), every insert path adds its id after the commit.
+Deleted ids aren't removed (a bitmap can't forget one id), they only cost the normal lookup.
+"""
+import math
+import time
+import asyncio
+import hashlib
+import numpy as np
+from sqlalchemy import select
+
+from . import database
+from .database import AsyncSessionLocal
+from .models import NumerologyReport, NumerologyReportAuth, CompatibilityReport
+from .config import BLOOM_FILTER_ENABLED, BLOOM_FP_RATE, BLOOM_CAPACITY, BLOOM_REBUILD_LOCK_TTL
+
+
+class IdBloomFilter():
+    """
+    Bloom filter in a Redis bitmap. Bit 0 is set once the filter holds every id, the id bits follow it,
+    until then (or without Redis) every id passes. The key is named after the size and hash count,
+    so workers only share a bitmap when they use the same BLOOM_CAPACITY and BLOOM_FP_RATE.
+    False positives (at most fp_rate while holding <= capacity ids) only cost the normal lookup.
+    """
+    def __init__(self, name, id_columns, capacity=BLOOM_CAPACITY, fp_rate=BLOOM_FP_RATE, enabled=BLOOM_FILTER_ENABLED):
+        self.id_columns = id_columns
+        self.enabled = enabled
+        self.capacity = max(int(capacity), 1)
+        self.fp_rate = fp_rate
+        # optimal size and hash count for capacity ids at fp_rate
+        self.size = math.ceil(-self.capacity * math.log(self.fp_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.key = f"bloom:{name}:{self.size}:{self.hashes}"
+
+        self.ready = False          # last seen ready bit
+        self._rebuild = None        # task rebuilding the filter in this process
+        self._rebuild_tried = None  # monotonic time of the last rebuild attempt
+        self._add_failed = False    # an id couldn't be added, the filter is incomplete
+
+        # metrics (this process)
+        self.checks = 0
+        self.filtered = 0
+        self.false_positives = 0
+
+    def _slots(self, item):
+        # double hashing, k slots from one 128 bit digest, after the ready bit
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [1 + (h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    async def add(self, item):
+        """Adds a new id, called after its row is committed."""
+        redis_client = database.get_redis_client()
+        if not self.enabled or redis_client is None:
+            return
+        try:
+            await self._repair(redis_client)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for slot in self._slots(item):
+                    pipe.setbit(self.key, slot, 1)
+                await pipe.execute()
+        except Exception as e:
+            # the id would be a false 404, the filter is marked incomplete as soon as Redis answers again
+            print("Failed to add id to the Redis id filter.", str(e))
+            self._add_failed = True
+
+    async def might_contain_many(self, items, count=True) -> list:
+        """Per item: False only if it was never added, True when it (probably) exists or the filter isn't usable."""
+        redis_client = database.get_redis_client()
+        if not self.enabled or redis_client is None or not items:
+            return [True] * len(items)
+        try:
+            await self._repair(redis_client)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.getbit(self.key, 0)
+                for item in items:
+                    for slot in self._slots(item):
+                        pipe.getbit(self.key, slot)
+                ready, *bits = await pipe.execute()
+        except Exception as e:
+            print("Redis unavailable, id filter skipped.", str(e))
+            return [True] * len(items)
+
+        self.ready = bool(ready)
+        if not self.ready:
+            self.start_rebuild()
+            return [True] * len(items)
+        found = [all(bits[i:i + self.hashes]) for i in range(0, len(bits), self.hashes)]
+        if count:
+            self.checks += len(found)
+            self.filtered += found.count(False)
+        return found
+
+    async def might_contain(self, item, count=True) -> bool:
+        return (await self.might_contain_many([item], count))[0]
+
+    def record_false_positive(self):
+        """Id passed the filter but wasn't in the database."""
+        self.false_positives += 1
+
+    async def _repair(self, redis_client):
+        if self._add_failed:
+            # every worker lets all ids pass until the filter is rebuilt
+            await redis_client.setbit(self.key, 0, 0)
+            self._add_failed = False
+            self._rebuild_tried = None
+            self.start_rebuild()
+
+    def start_rebuild(self):
+        """Rebuilds in the background, at most once per BLOOM_REBUILD_LOCK_TTL per process."""
+        now = time.monotonic()
+        if self._rebuild is not None or (
+            self._rebuild_tried is not None and now - self._rebuild_tried < BLOOM_REBUILD_LOCK_TTL
+        ):
+            return
+        self._rebuild_tried = now
+        self._rebuild = asyncio.create_task(self.rebuild())
+        self._rebuild.add_done_callback(self._rebuild_done)
+
+    def _rebuild_done(self, task):
+        self._rebuild = None
+        if not task.cancelled() and task.exception():
+            print("Rebuilding the id filter failed.", str(task.exception()))
+
+    async def rebuild(self):
+        """Adds every id of the id columns and sets the ready bit, in one worker at a time (Redis lock)."""
+        redis_client = database.get_redis_client()
+        if not self.enabled or redis_client is None:
+            return
+        if await redis_client.getbit(self.key, 0):
+            self.ready = True
+            return
+        lock_key = self.key + ":lock"
+        if not await redis_client.set(lock_key, 1, nx=True, ex=BLOOM_REBUILD_LOCK_TTL):
+            return  # another worker is rebuilding it
+        try:
+            bits = np.zeros(self.size + 1, dtype=bool)
+            bits[0] = True
+            async with AsyncSessionLocal() as db:
+                for column in self.id_columns:
+                    ids = await db.stream_scalars(select(column).execution_options(yield_per=10000))
+                    async for chunk in ids.partitions():
+                        bits[[slot for id in chunk for slot in self._slots(id)]] = True
+
+            # OR-ed into the shared bitmap (Redis bit 0 is the high bit of the first byte, as packbits),
+            # so ids added meanwhile are kept, and the ready bit is set together with the ids
+            rebuild_key = self.key + ":rebuild"
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(rebuild_key, np.packbits(bits).tobytes())
+                pipe.bitop("OR", self.key, self.key, rebuild_key)
+                pipe.delete(rebuild_key)
+                await pipe.execute()
+            self.ready = True
+        finally:
+            # a rebuild slower than the lock ttl may run next to another one, that only repeats the work
+            await redis_client.delete(lock_key)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "key": self.key,
+            "capacity": self.capacity,
+            "fp_rate": self.fp_rate,
+            "size": self.size,
+            "hashes": self.hashes,
+            "checks": self.checks,
+            "filtered": self.filtered,
+            "false_positives": self.false_positives,
+        }
+
+
+# NumerologyReport and NumerologyReportAuth ids share one filter (GET /r/{id} looks in both)
+report_ids = IdBloomFilter("report_ids", [NumerologyReport.id, NumerologyReportAuth.id])
+match_ids = IdBloomFilter("match_ids", [CompatibilityReport.id])
+
+
+async def rebuild_id_filters():
+    """Startup, builds the filters Redis doesn't have complete yet (one worker does, the others skip it)."""
+    for bloom in (report_ids, match_ids):
+        try:
+            await bloom.rebuild()
+        except Exception as e:
+            print("Id filter not built, every id passes until it is.", str(e))
+    print(f"Id filters ready: reports {report_ids.ready}, matches {match_ids.ready}")
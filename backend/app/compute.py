@@ -0,0 +1,193 @@
+# compute.py
+"""
+Executor layer for the CPU bound numerology work (Person construction, report / match / ranking data),
+keeps it off the event loop. Thread pool, process pool or inline (COMPUTE_EXECUTOR),
+tasks queued while all workers are busy are sent to a worker together as one batch.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from backend.utils.Numerology import (
+    Person, PersonCache, compact_match_data, person_signatures, rank_compatibility,
+    group_compatibility, get_feature_table, get_mulank_score_lut, get_lucky_mask_lut
+    )
+from .config import PERSON_CACHE_SIZE, COMPUTE_EXECUTOR, COMPUTE_WORKERS, COMPUTE_BATCH_SIZE
+
+# (dob, gender) -> Person / report data, popular birthdays are served without recomputing,
+# shared with the app for thread pools, every worker process has its own one
+person_cache = PersonCache(maxsize=PERSON_CACHE_SIZE)
+
+
+def warm_worker():
+    """Preloads the numerology data tables, so the first task of a worker doesn't pay for them."""
+    get_feature_table()
+    get_mulank_score_lut()
+    get_lucky_mask_lut()
+
+
+# --------------- tasks (module level functions, process pools pickle them by name) ---------------
+
+def build_report_data(dob, gender, name):
+    """Full report data of the person and its compact form (stored in SubReport)."""
+    report_data = person_cache.get_report_data(dob, gender, name)
+    compact_data = person_cache.get_person(dob, gender, name).get_compact_data()
+    return report_data, compact_data
+
+def build_match_data(person1, person2):
+    """Compact match data (stored in SubMatch) of two (dob, gender, name)."""
+    return compact_match_data(person_cache.get_person(*person1), person_cache.get_person(*person2))
+
+def build_report_text(dob, gender, name):
+    return Person(dob, gender, name).to_str()
+
+def rank_candidates(person, dobs, genders, names, top_k):
+    """[(candidate index, percentage)] of the most compatible candidates for person (dob, gender, name)."""
+    person = Person(*person)
+    if not dobs:
+        return []
+    mulanks, masks = person_signatures(dobs, genders, names)
+    return rank_compatibility(person.mulank, person.loshu_mask, mulanks, masks, top_k)
+
+def build_group_data(dobs, genders, names):
+    return group_compatibility(dobs, genders, names)
+
+def run_batch(tasks):
+    """Runs [(fn, args)] in a worker, returns [(ok, result or exception)]."""
+    results = []
+    for fn, args in tasks:
+        try:
+            results.append((True, fn(*args)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+# --------------- executor ---------------
+
+class ComputeExecutor():
+    def __init__(self, kind="thread", workers=4, batch_size=32):
+        self.kind = kind
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pool = None
+        self._queue = None
+        self._slots = None
+        self._dispatcher = None
+        # running batches, the event loop only keeps weak references to tasks
+        self._batches = set()
+
+        # metrics
+        self.in_flight = 0
+        self.tasks = 0
+        self.batches = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def start(self):
+        """Creates the pool and starts every worker (warm) before serving."""
+        if self.kind == "inline":
+            warm_worker()
+            return
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, initializer=warm_worker, thread_name_prefix="compute")
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._pool, warm_worker) for _ in range(self.workers)])
+
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        print(f"Compute executor started: {self.kind} x {self.workers}")
+
+    async def shutdown(self):
+        """Stops dispatching, tasks still queued or running fail instead of waiting forever."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for batch in self._batches:
+            batch.cancel()
+        # cancelled batches fail their own futures
+        await asyncio.gather(*self._batches, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            self._fail(future)
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn, *args):
+        """Runs fn(*args) on a worker and returns its result (inline when there's no pool, e.g. scripts)."""
+        if self._pool is None:
+            return fn(*args)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((fn, args, future, time.perf_counter()))
+        return await future
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            # everything queued meanwhile (arrived together or waited for a free worker) goes in the same batch
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch):
+        started = time.perf_counter()
+        for _, _, _, queued_at in batch:
+            wait = started - queued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        self.tasks += len(batch)
+        self.batches += 1
+        self.in_flight += len(batch)
+
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._pool, run_batch, [(fn, args) for fn, args, _, _ in batch]
+            )
+        except Exception as e:
+            # pool failure (e.g. a worker process died), fails the whole batch
+            results = [(False, e)] * len(batch)
+        except asyncio.CancelledError:
+            # shutdown
+            for _, _, future, _ in batch:
+                self._fail(future)
+            raise
+        finally:
+            self.in_flight -= len(batch)
+            self._slots.release()
+
+        for (_, _, future, _), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    def _fail(future):
+        if not future.done():
+            future.set_exception(RuntimeError("Compute executor was shut down"))
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "in_flight": self.in_flight,
+            "tasks": self.tasks,
+            "batches": self.batches,
+            "avg_batch_size": round(self.tasks / self.batches, 2) if self.batches else 0.0,
+            "avg_wait_ms": round(self.total_wait / self.tasks * 1000, 3) if self.tasks else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+compute_executor = ComputeExecutor(kind=COMPUTE_EXECUTOR, workers=COMPUTE_WORKERS, batch_size=COMPUTE_BATCH_SIZE)
@@ -17,4 +17,52 @@ DB_SECRET_KEY = os.getenv("DB_SECRET_KEY")
 # Initialize Redis client
 REDIS_HOST = os.getenv("REDIS_HOST", "redis_cache")
 REDIS_PORT = os.getenv("REDIS_PORT", 6379)
-REDIS_DB = os.getenv("REDIS_DB", 0)
\ No newline at end of file
+REDIS_DB = os.getenv("REDIS_DB", 0)
+
+# max (dob, gender, name) entries of the in-process Person/report cache, per worker
+PERSON_CACHE_SIZE = int(os.getenv("PERSON_CACHE_SIZE", 4096))
+
+# executor for the numerology (Person) work: thread | process | inline
+COMPUTE_EXECUTOR = os.getenv("COMPUTE_EXECUTOR", "thread")
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", 4))
+# max tasks sent to a worker in one go
+COMPUTE_BATCH_SIZE = int(os.getenv("COMPUTE_BATCH_SIZE", 32))
+
+# seconds a GET /r/{id} payload stays in Redis (routes changing a report invalidate it)
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 3600))
+# seconds a GET /m/{id} response stays in Redis (remove_match invalidates it)
+MATCH_CACHE_TTL = int(os.getenv("MATCH_CACHE_TTL", 3600))
+# seconds an unknown report id is remembered as missing (ids are server generated uuid4s)
+REPORT_MISS_TTL = int(os.getenv("REPORT_MISS_TTL", 300))
+
+# Bloom filters of existing report / match ids (bloom.py), bitmaps in Redis shared by every worker,
+# anything inserting reports / matches outside the app has to add their ids too (or turn it off)
+BLOOM_FILTER_ENABLED = os.getenv("BLOOM_FILTER_ENABLED", "1") == "1"
+BLOOM_FP_RATE = float(os.getenv("BLOOM_FP_RATE", 0.01))
+# ids a filter is sized for (1.2 MB of Redis per filter at 1%), more ids only raise the false positive rate
+BLOOM_CAPACITY = int(os.getenv("BLOOM_CAPACITY", 1000000))
+# seconds the rebuild lock is held, and between the rebuild attempts of a worker
+BLOOM_REBUILD_LOCK_TTL = int(os.getenv("BLOOM_REBUILD_LOCK_TTL", 60))
+# max connections of the shared Redis pool (per process), and seconds a request waits for a free one
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+REDIS_POOL_TIMEOUT = int(os.getenv("REDIS_POOL_TIMEOUT", 5))
+
+# serve the internal counters (/cache-stats, /compute-stats, /db-stats), only for debugging, off in production
+STATS_ENDPOINTS = os.getenv("STATS_ENDPOINTS", "0") == "1"
+
+# responses smaller than this aren't gzipped (GZipMiddleware and the pre-gzipped /freports cache)
+GZIP_MIN_SIZE = 400
+
+# /freports: seconds an expired entry is still served (while one request refreshes it),
+# the rebuild lock's ttl and how long a miss waits for another process' rebuild
+FREPORTS_STALE_TTL = int(os.getenv("FREPORTS_STALE_TTL", 300))
+FREPORTS_LOCK_TTL = int(os.getenv("FREPORTS_LOCK_TTL", 10))
+FREPORTS_LOCK_WAIT = float(os.getenv("FREPORTS_LOCK_WAIT", 3))
+# /freports refresh-ahead warmer: max keys kept warm (0 disables it), seconds between cycles,
+# seconds before expiry a key is refreshed and the random jitter (s) spreading refreshes,
+# max distinct keys whose requests are counted
+FREPORTS_WARM_KEYS = int(os.getenv("FREPORTS_WARM_KEYS", 24))
+FREPORTS_WARM_INTERVAL = float(os.getenv("FREPORTS_WARM_INTERVAL", 10))
+FREPORTS_WARM_AHEAD = float(os.getenv("FREPORTS_WARM_AHEAD", 5))
+FREPORTS_WARM_JITTER = float(os.getenv("FREPORTS_WARM_JITTER", 3))
+FREPORTS_TRACKED_KEYS = int(os.getenv("FREPORTS_TRACKED_KEYS", 1000))
\ No newline at end of file
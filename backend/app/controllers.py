@@ -8,46 +8,186 @@ from .models import (
     ReportIssues, CompatibilityReport, 
     SubMatch, AuthUser, NumerologyReportAuth
     )
-from backend.utils.Numerology import Person
-from sqlalchemy.orm import Session
+from backend.utils.Numerology import (
+    hydrate_report_data, hydrate_match_data, swap_match_data
+    )
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .jwt import create_jwt_token, create_report_tokens
+# ids that were never created are answered with 404 before any lookup (see bloom.py)
+from .bloom import report_ids, match_ids
+# all Person work runs on the compute executor (see compute.py)
+from .compute import (
+    compute_executor, person_cache, build_report_data,
+    build_match_data, rank_candidates, build_group_data
+    )
+
+# --------------------- UPSERTS ---------------
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+async def insert_or_get(db: AsyncSession, model, key: dict, **values):
+    """
+    Race free get-or-create on a unique natural key (users, sub_reports, sub_matches),
+    one INSERT ... ON CONFLICT DO NOTHING RETURNING, if the row is already there (or a concurrent
+    request inserted it first) it's selected instead. Returns (row, created).
+    Doesn't commit, it's part of the caller's transaction.
+    """
+    dialect_insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = (
+        dialect_insert(model).values(**key, **values)
+        .on_conflict_do_nothing(index_elements=list(key))
+        .returning(model)
+    )
+    row = (await db.scalars(stmt)).first()
+    if row is not None:
+        return row, True
+    return (await db.scalars(select(model).filter_by(**key))).one(), False
+
+# --------------------- READ-THROUGH CACHE (GET /r/{id}, GET /m/{id}) ---------------
+
+from fastapi.encoders import jsonable_encoder
+from .config import REPORT_CACHE_TTL, MATCH_CACHE_TTL
+
+def report_cache_key(report_id) -> str:
+    return f"report:{report_id}"
 
-from .jwt import create_jwt_token
+def match_cache_key(match_id) -> str:
+    return f"match:{match_id}"
+
+async def cache_get(redis_client, key):
+    """Cached payload, None on a miss or when Redis is unavailable."""
+    if redis_client is None:
+        return None
+    try:
+        cached = await redis_client.get(key)
+    except Exception as e:
+        print("Redis unavailable, reading from database.", str(e))
+        return None
+    return json.loads(cached) if cached else None
+
+async def cache_set(redis_client, key, data, ttl):
+    if redis_client is None:
+        return
+    try:
+        # encoded like FastAPI encodes the response, so a hit returns the same JSON
+        await redis_client.setex(key, ttl, json.dumps(jsonable_encoder(data)))
+    except Exception as e:
+        print("Failed to write to Redis cache.", str(e))
+
+async def cache_delete(redis_client, key):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.delete(key)
+    except Exception as e:
+        print("Failed to invalidate Redis cache.", str(e))
+
+async def invalidate_report_cache(redis_client, report_id):
+    """Drops the cached report, called by every route that changes or deletes a report."""
+    await cache_delete(redis_client, report_cache_key(report_id))
+
+# --------------------- REPORT LOOKUP (numerology_reports + numerology_reports_auth) ---------------
+
+from sqlalchemy import union_all
+from sqlalchemy.orm import joinedload
+from .config import REPORT_MISS_TTL
+
+def missing_report_key(report_id) -> str:
+    return f"report:missing:{report_id}"
+
+async def find_reports(db: AsyncSession, ids: list) -> dict:
+    """
+    id -> NumerologyReport (with its sub_report) or NumerologyReportAuth, for the ids that exist.
+    Both tables are outer joined to the ids found in either of them (primary key IN lookups),
+    so it's one query whichever table each report is in.
+    """
+    report_ref = union_all(
+        select(NumerologyReport.id.label("id")).filter(NumerologyReport.id.in_(ids)),
+        select(NumerologyReportAuth.id.label("id")).filter(NumerologyReportAuth.id.in_(ids)),
+    ).subquery("report_ref")
+    rows = (await db.execute(
+        select(report_ref.c.id, NumerologyReport, NumerologyReportAuth)
+        .select_from(report_ref)
+        .outerjoin(NumerologyReport, NumerologyReport.id == report_ref.c.id)
+        .outerjoin(NumerologyReportAuth, NumerologyReportAuth.id == report_ref.c.id)
+        .options(joinedload(NumerologyReport.sub_report))
+    )).all()
+    return {
+        id: public_report or auth_report
+        for id, public_report, auth_report in rows
+        if public_report or auth_report
+    }
+
+async def find_report(db: AsyncSession, report_id: UUID, redis_client=None):
+    """
+    Report of report_id in either table (see find_reports), None if neither has it.
+    Unknown ids are cached for REPORT_MISS_TTL so repeated lookups of random ids skip the database.
+    """
+    if not await report_ids.might_contain(report_id):
+        return None
+    if await cache_get(redis_client, missing_report_key(report_id)):
+        return None
+
+    report = (await find_reports(db, [report_id])).get(report_id)
+    if report is None:
+        report_ids.record_false_positive()
+        await cache_set(redis_client, missing_report_key(report_id), 1, REPORT_MISS_TTL)
+    return report
 
 # --------------------- COMPATIBILITY ---------------
 
+from sqlalchemy.orm import aliased
 
-def get_or_create_user(name: str, dob: str, gender: str, db: Session):
+
+async def get_or_create_user(name: str, dob: str, gender: str, db: AsyncSession):
     """Helper function to get or create a user."""
-    user = db.query(User).filter(
-        User.name == name, User.dob == dob, User.gender == gender
-    ).first()
-
-    if not user:
-        user = User(name=name, dob=dob, gender=gender)
-        db.add(user)
-        db.commit()
-        # db.refresh(user)
+    user, _ = await insert_or_get(db, User, {"name": name, "dob": dob, "gender": gender})
     return user
 
-async def get_match(match_id: UUID, db: Session):
-    # Step 1: Retrieve the CompatibilityReport using match_id
-    report = db.query(CompatibilityReport).filter(
-        CompatibilityReport.id == match_id
-    ).first()
+def canonical_pair(p1, p2):
+    """Orders two persons by (dob, gender), returns (first, second, swapped) so A-B and B-A share a SubMatch."""
+    if (p2.dob, p2.gender) < (p1.dob, p1.gender):
+        return p2, p1, True
+    return p1, p2, False
+
+def oriented_match_data(match_data, swapped):
+    """Full match data of a canonical SubMatch, seen from the requested person1."""
+    match_data = hydrate_match_data(match_data)
+    return swap_match_data(match_data) if swapped else match_data
+
+async def get_match(match_id: UUID, db: AsyncSession, redis_client=None):
+    # match links are shared in chats, the assembled response is cached (see remove_match)
+    response_data = await cache_get(redis_client, match_cache_key(match_id))
+    if response_data is None:
+        response_data = await build_match_response(match_id, db)
+        await cache_set(redis_client, match_cache_key(match_id), response_data, MATCH_CACHE_TTL)
+    return response_data
 
-    if not report:
+async def build_match_response(match_id: UUID, db: AsyncSession):
+    if not await match_ids.might_contain(match_id):
         raise HTTPException(status_code=404, detail="Compatibility report not found")
 
-    # Step 2: Retrieve users involved
-    user1 = db.query(User).filter(User.id == report.user1_id).first()
-    user2 = db.query(User).filter(User.id == report.user2_id).first()
+    # report, both users and the sub match in one query (outer joins, so a missing part still gets its own 404)
+    User1, User2 = aliased(User), aliased(User)
+    row = (await db.execute(
+        select(CompatibilityReport, User1, User2, SubMatch)
+        .outerjoin(User1, User1.id == CompatibilityReport.user1_id)
+        .outerjoin(User2, User2.id == CompatibilityReport.user2_id)
+        .outerjoin(SubMatch, SubMatch.id == CompatibilityReport.sub_match_id)
+        .filter(CompatibilityReport.id == match_id)
+    )).first()
+
+    if not row:
+        match_ids.record_false_positive()
+        raise HTTPException(status_code=404, detail="Compatibility report not found")
+    report, user1, user2, sub_match = row
 
     if not user1 or not user2:
         raise HTTPException(status_code=404, detail="One or both users not found")
 
-    # Step 3: Retrieve SubMatch data
-    sub_match = db.query(SubMatch).filter(SubMatch.id == report.sub_match_id).first()
-
     if not sub_match:
         raise HTTPException(status_code=404, detail="Sub-match data not found")
 
@@ -55,6 +195,9 @@ async def get_match(match_id: UUID, db: Session):
     name1 = report.person1_name or user1.name
     name2 = report.person2_name or user2.name
 
+    # sub match is stored in canonical order, flip it if user1 is its second person
+    swapped = (user1.dob, user1.gender) != (sub_match.dob1, sub_match.gender1)
+
     # Prepare the response data
     return {
         "match_id": str(report.id),
@@ -68,96 +211,278 @@ async def get_match(match_id: UUID, db: Session):
             "dob": user2.dob,
             "gender": user2.gender
         },
-        "match_data": sub_match.match_data,
+        "match_data": oriented_match_data(sub_match.match_data, swapped),
         "created_at": report.created_at
     }
     
 async def compute_match_data(p1, p2):
     """Placeholder function to compute compatibility match data."""
     
-    # Replace this with your logic for compatibility scoring and data generation
-    op1 = Person(p1.dob, p1.gender, p1.name)
-    op2 = Person(p2.dob, p2.gender, p2.name)
-    c_data = op1.get_compatibility_data(op2)
+    # only signatures and scores are stored, see hydrate_match_data
+    c_data = await compute_executor.run(
+        build_match_data, (p1.dob, p1.gender, p1.name), (p2.dob, p2.gender, p2.name)
+    )
     return c_data
     
     
-async def generate_compatibility_report(match_request, db: Session):
+async def generate_compatibility_report(match_request, db: AsyncSession):
     try:
         # Extracting person data
         p1 = match_request.person_1
         p2 = match_request.person_2
 
-        # Step 1: Fetch or create users
-        user1 = get_or_create_user(p1.name, p1.dob, p1.gender, db)
-        user2 = get_or_create_user(p2.name, p2.dob, p2.gender, db)
-
-        # Ensure the same user IDs are stored consistently (e.g., user1_id < user2_id)
-        user1_id, user2_id = sorted([user1.id, user2.id])
-
-        # Step 2: Check if SubMatch already exists for the given DOB and gender combination
-        existing_sub_match = db.query(SubMatch).filter(
-            SubMatch.dob1 == p1.dob, SubMatch.gender1 == p1.gender,
-            SubMatch.dob2 == p2.dob, SubMatch.gender2 == p2.gender
-        ).first()
+        # Step 1: Check if SubMatch already exists for the DOB and gender pair (canonical order),
+        # it's computed before anything is written, so no inserted row stays locked while the executor works
+        first, second, swapped = canonical_pair(p1, p2)
+        sub_match = (await db.scalars(select(SubMatch).filter(
+            SubMatch.dob1 == first.dob, SubMatch.gender1 == first.gender,
+            SubMatch.dob2 == second.dob, SubMatch.gender2 == second.gender
+        ))).first()
 
-        if existing_sub_match:
-            print(f"Using existing SubMatch: {existing_sub_match.id}")
-            sub_match = existing_sub_match
+        if sub_match:
+            print(f"Using existing SubMatch: {sub_match.id}")
             # match_data = json.loads(sub_match.match_data)
-            match_data = sub_match.match_data
+            compact_data = sub_match.match_data
         else:
+            # ends the read only transaction, its connection goes back to the pool during the computation
+            await db.commit()
             # Generate new match data
-            match_data = await compute_match_data(p1, p2) 
-            sub_match = SubMatch(
-                dob1=p1.dob, gender1=p1.gender,
-                dob2=p2.dob, gender2=p2.gender,
-                match_data=match_data
+            compact_data = await compute_match_data(first, second)
+        match_data = oriented_match_data(compact_data, swapped)
+
+        # Step 2: Fetch or create users, always in the same (dob, gender, name) order, so concurrent
+        # A-B and B-A requests lock new users in the same order instead of deadlocking on each other's
+        if (p2.dob, p2.gender, p2.name) < (p1.dob, p1.gender, p1.name):
+            user2 = await get_or_create_user(p2.name, p2.dob, p2.gender, db)
+            user1 = await get_or_create_user(p1.name, p1.dob, p1.gender, db)
+        else:
+            user1 = await get_or_create_user(p1.name, p1.dob, p1.gender, db)
+            user2 = await get_or_create_user(p2.name, p2.dob, p2.gender, db)
+
+        # Ensure the same user IDs are stored consistently (e.g., user1_id < user2_id), names follow their users
+        user1_id, user2_id = sorted([user1.id, user2.id])
+        name1, name2 = (p1.name, p2.name) if user1_id == user1.id else (p2.name, p1.name)
+
+        if sub_match is None:
+            # concurrent requests for the same pair can both get here, only one row is inserted
+            sub_match, _ = await insert_or_get(
+                db, SubMatch,
+                {"dob1": first.dob, "gender1": first.gender, "dob2": second.dob, "gender2": second.gender},
+                match_data=compact_data
             )
-            db.add(sub_match)
-            db.commit()
             # db.refresh(sub_match)
  
         # Step 3: Create the CompatibilityReport
         new_report = CompatibilityReport(
             user1_id=user1_id, user2_id=user2_id,
-            person1_name=p1.name, person2_name=p2.name,
+            person1_name=name1, person2_name=name2,
             sub_match_id=sub_match.id
         )
         db.add(new_report)
-        db.commit()
+        # flush only to get the match id (and created_at), users, sub match and report are committed together
+        await db.flush()
+        match_id = str(new_report.id)
+        created_at = new_report.created_at
+        await db.commit()
+        await match_ids.add(match_id)
         # db.refresh(new_report)
         # print(p1, p2,user1, user2,user1.gender, user2.gender )
 
         # Step 4: Prepare the response
         return {
-            "match_id": str(new_report.id),
+            "match_id": match_id,
             "match_data": match_data,
-            "created_at": new_report.created_at
+            "created_at": created_at
         }
     except Exception as ex:
         # print("MatchExc:",ex)
         raise HTTPException(status_code=500, detail=f"Failed to create compatibility report: {ex}")
     
 
-async def remove_match(match_id: UUID, db: Session):
-    report = db.query(CompatibilityReport).filter(CompatibilityReport.id == match_id).first()
+async def remove_match(match_id: UUID, db: AsyncSession, redis_client=None):
+    report = await db.get(CompatibilityReport, match_id)
 
     if report is None:
         raise HTTPException(status_code=404, detail="Report not found")
     
     # rep = db.query(SubMatch).filter(SubMatch.id == report.sub_match_id).first()
     # db.delete(rep)  
-    db.delete(report)
-    db.commit()
+    await db.delete(report)
+    await db.commit()
+    await cache_delete(redis_client, match_cache_key(match_id))
     return {"message": "Report removed successfully"}
 
+# --------------- RANKING (one person vs many) ---------------
+
+from datetime import date
+from sqlalchemy import func
+from .schemas import CompatibilityRankRequest, RankFilters
+from backend.utils.Numerology import validate_dob
+
+def normalize_dob(dob: str) -> str:
+    """YYYY-MM-DD form (what the batch features need) of any dob /match accepts, e.g. not zero padded."""
+    dd, mm, yy = validate_dob(dob)
+    return f"{yy:04d}-{mm:02d}-{dd:02d}"
+
+def normalize_people(people: list):
+    """
+    (people with normalized dobs, errors) of people dicts (name, dob, gender), the ones with a dob
+    /match would reject are left out and reported as {"index", "dob", "detail"} instead of failing them all.
+    """
+    valid, errors = [], []
+    for idx, person in enumerate(people):
+        try:
+            valid.append({**person, "dob": normalize_dob(person["dob"])})
+        except (ValueError, TypeError) as e:
+            errors.append({"index": idx, "dob": person["dob"], "detail": str(e)})
+    return valid, errors
+
+async def get_rank_candidates(filters: RankFilters, db: AsyncSession):
+    """Public reports matching the filters, as ranking candidates (only needed columns are fetched)."""
+    min_dob = date.today().replace(year=date.today().year - filters.age) if filters.age else None
+
+    def apply_filters(query, name_field, dob_field, gender_field, instagram_field):
+        if filters.gender:
+            query = query.filter(func.lower(gender_field) == filters.gender.lower())
+        if filters.haveInstagram:
+            query = query.filter(instagram_field.isnot(None))
+        if filters.personName:
+            query = query.filter(func.lower(name_field).contains(filters.personName.lower()))
+        if min_dob:
+            query = query.filter(func.to_date(dob_field, "YYYY-MM-DD") >= min_dob)
+        return query
+
+    person_info = NumerologyReportAuth.report_data["person_info"]
+    auth_query = select(
+        NumerologyReportAuth.id, person_info["name"].astext, person_info["dob"].astext,
+        person_info["gender"].astext, NumerologyReportAuth.instagram_username
+    ).filter(NumerologyReportAuth.is_public.is_(True))
+    auth_query = apply_filters(
+        auth_query, person_info["name"].astext, person_info["dob"].astext,
+        person_info["gender"].astext, NumerologyReportAuth.instagram_username
+    )
+    auth_rows = (await db.execute(auth_query.order_by(NumerologyReportAuth.created_at.desc()).limit(filters.limit))).all()
+
+    public_query = select(
+        NumerologyReport.id, NumerologyReport.person_name, SubReport.dob,
+        SubReport.gender, NumerologyReport.instagram_username
+    ).join(SubReport, NumerologyReport.sub_report_id == SubReport.id).filter(NumerologyReport.is_public.is_(True))
+    public_query = apply_filters(
+        public_query, NumerologyReport.person_name, SubReport.dob,
+        SubReport.gender, NumerologyReport.instagram_username
+    )
+    public_rows = (await db.execute(public_query.order_by(NumerologyReport.created_at.desc()).limit(filters.limit))).all()
+
+    candidates = []
+    for rows, is_auth_user in ((auth_rows, True), (public_rows, False)):
+        for report_id, name, dob, gender, instagram in rows:
+            # batch features need YYYY-MM-DD dobs, old non padded ones are normalized, invalid ones skipped
+            try:
+                dob = normalize_dob(dob)
+            except (ValueError, TypeError):
+                continue
+            candidates.append({
+                "report_id": str(report_id),
+                "name": name or "Unnamed",
+                "dob": dob,
+                "gender": gender,
+                "instagram": instagram,
+                "is_auth_user": is_auth_user,
+            })
+    return candidates[:filters.limit]
+
+
+async def rank_matches(rank_request: CompatibilityRankRequest, db: AsyncSession):
+    """Top-K most compatible candidates for one person, scored in one vectorized pass."""
+    p = rank_request.person
+    try:
+        person_dob = normalize_dob(p.dob)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    errors = []
+    if rank_request.candidates:
+        # a bad candidate is reported in errors, the others are still ranked
+        candidates, errors = normalize_people([
+            {"index": idx, "name": c.name, "dob": c.dob, "gender": c.gender}
+            for idx, c in enumerate(rank_request.candidates)
+        ])
+    elif rank_request.filters:
+        candidates = await get_rank_candidates(rank_request.filters, db)
+    else:
+        raise HTTPException(status_code=400, detail="Either candidates or filters are required")
+
+    # also validates the person when there are no candidates
+    try:
+        ranked = await compute_executor.run(
+            rank_candidates, (person_dob, p.gender, p.name),
+            [c["dob"] for c in candidates], [c["gender"] for c in candidates], [c["name"] for c in candidates],
+            rank_request.top_k
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    matches = [
+        {**candidates[idx], "compatibility_percentage": percentage}
+        for idx, percentage in ranked
+    ]
+
+    return {
+        "person": {"name": p.name, "dob": person_dob, "gender": p.gender},
+        "total_candidates": len(candidates),
+        "matches": matches,
+        "errors": errors,
+    }
+
+# --------------- GROUP (N persons) ---------------
+
+from .schemas import GroupMatchRequest
+
+async def compute_group_data(people: list):
+    """Pairwise matrix and combined group grid of people (dicts with name, dob, gender)."""
+    try:
+        group_data = await compute_executor.run(
+            build_group_data, [p["dob"] for p in people], [p["gender"] for p in people], [p["name"] for p in people]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"people": people, **group_data}
+
+
+async def generate_group_compatibility(group_request: GroupMatchRequest):
+    # people with a dob /match would reject are reported in errors, the rest still form the group
+    people, errors = normalize_people([{"name": p.name, "dob": p.dob, "gender": p.gender} for p in group_request.people])
+    if len(people) < 2:
+        raise HTTPException(status_code=400, detail={"message": "At least 2 people with a valid dob are required", "errors": errors})
+    return {**await compute_group_data(people), "errors": errors}
+
+
+async def get_friends_group_compatibility(auth0_user, db: AsyncSession):
+    """Group compatibility of the auth user and their friends (friend_association)."""
+    user = (await db.scalars(
+        select(AuthUser).options(selectinload(AuthUser.friends)).filter(AuthUser.auth0_id == auth0_user.id)
+    )).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # only members with a valid dob (normalized), capped like the public group route
+    people, _ = normalize_people([
+        {"id": str(member.id), "name": member.fullname or "Unnamed", "dob": member.dob, "gender": member.gender}
+        for member in [user] + list(user.friends)
+    ])
+    people = people[:200]
+    if len(people) < 2:
+        raise HTTPException(status_code=404, detail="No friends to match with")
+    return await compute_group_data(people)
+
+
+
 
 # --------------numerology reports --------------
 
 from .schemas import ReportCreate, SavedReportIDs
 
-async def generate_report(report : ReportCreate,  db: Session):
+async def generate_report(report : ReportCreate,  db: AsyncSession):
     name= report.name
     dob = report.dob
     gender = report.gender
@@ -166,28 +491,13 @@ async def generate_report(report : ReportCreate,  db: Session):
     name = name.capitalize()
     gender = gender.capitalize()
 
-    # Check if a user already exists    
-    existing_user = db.query(User).filter(
-        # User.name == name,
-        User.dob == dob,
-        User.gender == gender,
-    ).first()
-    
-    if existing_user:
-        new_user = existing_user
-        # print("Using existing user:", new_user.id)
-    else:
-        # Create a new User object
-        new_user = User(name=name, dob=dob, gender=gender)
-        db.add(new_user)
-        db.commit()
-        
-    # Check if a report already exists with the same dob and gender
+    # Check if a report already exists with the same dob and gender,
+    # it's computed before anything is written, so no inserted row stays locked while the executor works
 
-    existing_report = db.query(SubReport).filter(
+    existing_report = (await db.scalars(select(SubReport).filter(
         SubReport.dob == dob,
         SubReport.gender == gender
-    ).first()
+    ))).first()
     
     if existing_report:
         sub_report = existing_report
@@ -195,23 +505,38 @@ async def generate_report(report : ReportCreate,  db: Session):
                 
         # replace the name with current user, 
         # modified_report_data  = json.loads(sub_report.report_data)
-        modified_report_data  = sub_report.report_data
+        modified_report_data  = hydrate_report_data(sub_report.report_data)
         modified_report_data["person_info"]["name"] = name
         # print("modif 188",modified_report_data)
     else:
+        # ends the read only transaction, its connection goes back to the pool during the computation
+        await db.commit()
         try:
             # person_obj = Person(dob, gender, name, is_include_namaank=True)
             # not including namaank for public user as it would increase dependency=&=storage
-            person_obj = Person(dob, gender, name)
-            report_data = person_obj.get_all_data()
+            # only the computed features are stored (compact_data), text is rehydrated when read
+            report_data, compact_data = await compute_executor.run(build_report_data, dob, gender, name)
         except Exception as e:
             # print("Error while creating Report!",str(e))
             raise HTTPException(status_code=404, detail=f"Error while creating Report!, {str(e)}")
 
-        # Create a new SubReport object  
-        sub_report = SubReport(report_data=report_data, dob=dob, gender=gender)
-        db.add(sub_report)
-        db.commit()
+    # Check if a user already exists    
+    existing_user = (await db.scalars(select(User).filter(
+        # User.name == name,
+        User.dob == dob,
+        User.gender == gender,
+    ))).first()
+    
+    if existing_user:
+        new_user = existing_user
+        # print("Using existing user:", new_user.id)
+    else:
+        # Create a new User object
+        new_user, _ = await insert_or_get(db, User, {"name": name, "dob": dob, "gender": gender})
+
+    if existing_report is None:
+        # Create a new SubReport object (concurrent requests for the same dob can both get here, only one row is inserted)
+        sub_report, _ = await insert_or_get(db, SubReport, {"dob": dob, "gender": gender}, report_data=compact_data)
 
     # print("previous-Commits :",new_user.id,sub_report.id)
     # Now make refer to above report_data
@@ -220,23 +545,24 @@ async def generate_report(report : ReportCreate,  db: Session):
     new_report = NumerologyReport(user_id=new_user.id, sub_report_id=sub_report.id, person_name = name, is_temporary = is_temp)
     db.add(new_report)
     
-    db.commit()
+    # flush only to get the report id (and created_at), everything is committed once below
+    await db.flush()
+    report_id = str(new_report.id)
+    created_at = new_report.created_at
     
     if auth0_id:
-        existing_auth_user = db.query(AuthUser).filter(AuthUser.auth0_id == auth0_id).first()
-
-        # Ensure n_reports is initialized (empty list if None)
-        if existing_auth_user.n_reports is None:
-            existing_auth_user.n_reports = []
+        existing_auth_user = (await db.scalars(select(AuthUser).filter(AuthUser.auth0_id == auth0_id))).first()
 
-        # Append the new report ID to the list
-        existing_auth_user.n_reports.append(str(new_report.id))  # new_report.id is the UUID
+        # Append the new report ID to the list (n_reports is None at first),
+        # a new list is assigned as in place changes of a JSON column aren't tracked
+        existing_auth_user.n_reports = (existing_auth_user.n_reports or []) + [report_id]
 
-        # Commit the changes to the database
-        db.commit()
+    # Commit the user, sub report and report (and n_reports) together
+    await db.commit()
+    await report_ids.add(report_id)
     
     # Create JWT token for this report (with 5-month expiration)
-    n_report_data = {"report_id": str(new_report.id)}
+    n_report_data = {"report_id": report_id}
     token = create_jwt_token(n_report_data)
 
     # Prepare the modified report data for the response
@@ -244,7 +570,7 @@ async def generate_report(report : ReportCreate,  db: Session):
     # modified_report_data_json = json.dumps(modified_report_data) if existing_report else report_data
 
     return {
-        "report_id": str(new_report.id),   
+        "report_id": report_id,   
         "token": token,
         "user_data" :{
             "report_data": modified_report_data if existing_report else report_data,
@@ -254,24 +580,42 @@ async def generate_report(report : ReportCreate,  db: Session):
             "instagram": None,
             "is_public": True,
             "rating": 3,
-            "created_at":new_report.created_at
+            "created_at":created_at
         },
     }
 
 
-async def get_report(report_id : UUID, db: Session, payload):
-    report = db.query(NumerologyReport).filter(NumerologyReport.id == report_id).first()
-    if report is None:
-        report = db.query(NumerologyReportAuth).filter(NumerologyReportAuth.id == report_id).first()
+async def get_report(report_id : UUID, db: AsyncSession, payload, redis_client=None):
+    # the payload is the same for every viewer and cached as is (report_data compact), only is_authorized depends on the token
+    response_data = await cache_get(redis_client, report_cache_key(report_id))
+    if response_data is None:
+        response_data = await build_report_response(report_id, db, redis_client)
+        await cache_set(redis_client, report_cache_key(report_id), response_data, REPORT_CACHE_TTL)
+    response_data = hydrate_report_response(response_data)
 
-    if report is None:
-        raise HTTPException(status_code=404, detail="Report not found")
-    
     # Check if the user is authorized (only if payload is not None)
     is_authorized = False
     if payload:
-        is_authorized =  str(report.id) == payload.get('report_id')
-    
+        is_authorized = str(report_id) == payload.get('report_id')
+    response_data["user_data"]["is_authorized"] = is_authorized
+
+    return response_data
+
+
+async def build_report_response(report_id : UUID, db: AsyncSession, redis_client=None):
+    """Report payload of GET /r/{id}, is_authorized is set by get_report."""
+    report = await find_report(db, report_id, redis_client)
+
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return await report_response(report, db)
+
+
+async def report_response(report, db: AsyncSession):
+    """
+    Payload of a loaded report (NumerologyReport with sub_report, or NumerologyReportAuth),
+    the report_data of a sub_report is left compact, see hydrate_report_response.
+    """
     if report.rating == 0:
         raise HTTPException(status_code=404, detail="Not Found")
 
@@ -280,17 +624,16 @@ async def get_report(report_id : UUID, db: Session, payload):
     elif isinstance(report, NumerologyReport):
         sub_report = report.sub_report
         if not sub_report:
-            user = db.query(User).filter(User.id == report.user_id).first()
+            user = await db.get(User, report.user_id) if report.user_id else None
             if user:       
-                person_obj = Person(user.dob, user.gender, user.name)
-                report_data = person_obj.get_all_data()
+                report_data, _ = await compute_executor.run(build_report_data, user.dob, user.gender, user.name)
         else:
             # Parse the JSON report data
             try:
-                report_data = sub_report.report_data
                 # report_data = json.loads(sub_report.report_data)
-                # replace the name in the sub_report data 
-                report_data['person_info']['name'] = report.person_name
+                # replace the name in the sub_report data (a copy, the row isn't changed)
+                report_data = {**sub_report.report_data}
+                report_data['person_info'] = {**report_data['person_info'], 'name': report.person_name}
                 # report_data = report_data
                 # report_data = json.dumps(report_data)
             except json.JSONDecodeError:
@@ -299,10 +642,10 @@ async def get_report(report_id : UUID, db: Session, payload):
                 raise HTTPException(status_code=500, detail=f"Error occured in report_data, {str(e)}")
             
     response_data = {
-        "report_id":report_id,
+        "report_id":report.id,
         "user_data": {
             "report_data": report_data, 
-            "is_authorized": is_authorized,
+            "is_authorized": False,
             "is_auth_user": isinstance(report, NumerologyReportAuth),
             "summary": report.summary if isinstance(report, NumerologyReportAuth) else None,
             "is_temporary":report.is_temporary if isinstance(report, NumerologyReport) else False,
@@ -314,34 +657,115 @@ async def get_report(report_id : UUID, db: Session, payload):
         
     return response_data
 
-async def get_report_setAuth(auth0_user, data: SavedReportIDs, db: Session):
+
+def hydrate_report_response(response_data):
+    """
+    Payload with the full report_data. Cached payloads keep the compact one (as stored in SubReport) and are
+    hydrated when read, so text corrections show up right away instead of after REPORT_CACHE_TTL.
+    """
+    try:
+        report_data = hydrate_report_data(response_data["user_data"]["report_data"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error occured in report_data, {str(e)}")
+    return {**response_data, "user_data": {**response_data["user_data"], "report_data": report_data}}
+
+# --------------- BATCH (POST /r/batch) ---------------
+
+from .schemas import BatchReportRequest
+from .jwt import decode_jwt_token
+
+async def get_reports_batch(batch: BatchReportRequest, db: AsyncSession, redis_client=None):
+    """
+    GET /r/{id} for several reports (saved report lists), one result per requested report:
+    {"report_id", "status": 200, "data": <GET /r/{id} payload>} or {"report_id", "status": 403 / 404, "detail"}.
+    Cached payloads are read with one MGET, the rest is loaded in one query.
+    """
+    errors = {}     # index in batch.reports -> (status, detail)
+    payloads = {}   # report id -> payload (is_authorized not set, report_data compact)
+
+    # one Redis round trip for the whole batch
+    known = await report_ids.might_contain_many([ref.report_id for ref in batch.reports])
+    for i, ref in enumerate(batch.reports):
+        # same check as JWTBearer, but per report
+        if ref.token and not decode_jwt_token(ref.token):
+            errors[i] = (403, "Invalid or expired token")
+        elif not known[i]:
+            errors[i] = (404, "Report not found")
+
+    ids = list(dict.fromkeys(ref.report_id for i, ref in enumerate(batch.reports) if i not in errors))
+    if ids and redis_client is not None:
+        try:
+            cached = await redis_client.mget([report_cache_key(id) for id in ids])
+            payloads = {id: json.loads(data) for id, data in zip(ids, cached) if data}
+        except Exception as e:
+            print("Redis unavailable, reading reports from database.", str(e))
+
+    missing_ids = [id for id in ids if id not in payloads]
+    if missing_ids:
+        reports = await find_reports(db, missing_ids)
+        for id in missing_ids:
+            report = reports.get(id)
+            if report is None:
+                report_ids.record_false_positive()
+                continue
+            try:
+                payloads[id] = await report_response(report, db)
+            except HTTPException as e:
+                payloads[id] = e
+                continue
+            await cache_set(redis_client, report_cache_key(id), payloads[id], REPORT_CACHE_TTL)
+
+    results = []
+    for i, ref in enumerate(batch.reports):
+        payload = payloads.get(ref.report_id)
+        if i in errors:
+            status, detail = errors[i]
+        elif payload is None:
+            status, detail = 404, "Report not found"
+        elif isinstance(payload, HTTPException):
+            status, detail = payload.status_code, payload.detail
+        else:
+            # payloads are shared by repeated ids, is_authorized depends on each token
+            token_payload = decode_jwt_token(ref.token) if ref.token else None
+            is_authorized = bool(token_payload) and str(ref.report_id) == token_payload.get('report_id')
+            try:
+                data = hydrate_report_response(payload)
+            except HTTPException as e:
+                results.append({"report_id": ref.report_id, "status": e.status_code, "detail": e.detail})
+                continue
+            data["user_data"]["is_authorized"] = is_authorized
+            results.append({"report_id": ref.report_id, "status": 200, "data": data})
+            continue
+        results.append({"report_id": ref.report_id, "status": status, "detail": detail})
+
+    return {"results": results}
+
+
+async def get_report_setAuth(auth0_user, data: SavedReportIDs, db: AsyncSession, limit: int = None, offset: int = 0):
     """
     Returns reports based on saved report IDs from the frontend.
     Excludes already saved IDs and handles `is_self` flag.
+    Created reports (newest first) are all returned, or one page with limit / offset,
+    the self-report comes with the first page, a page shorter than limit is the last one.
     """
     saved_report_ids = set(data.saved_report_ids or [])
     is_self = data.is_self
 
-    # Fetch the user
-    user = db.query(AuthUser).filter(AuthUser.auth0_id == auth0_user.id).first()
+    # Fetch the user with the self-report (NumerologyReportAuth)
+    user = (await db.scalars(
+        select(AuthUser).options(joinedload(AuthUser.self_report)).filter(AuthUser.auth0_id == auth0_user.id)
+    )).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Fetch the self-report (NumerologyReportAuth)
-    self_report = (
-        db.query(NumerologyReportAuth)
-        .filter(NumerologyReportAuth.id == user.self_report.id)
-        .first()
-    )
+    self_report = user.self_report
     if self_report is None:
         raise HTTPException(status_code=404, detail="Self-report not found, Required!")
 
-    # If only self-report is requested
-    if is_self:
-        self_report_token = create_jwt_token({"report_id": str(self_report.id)})
-        return [{
+    def self_report_entry(token):
+        return {
             "report_id": self_report.id,
-            "token": self_report_token,
+            "token": token,
             "user_data": {
                 "report_data": self_report.report_data,
                 "is_authorized": True,  # Self-report is always authorized
@@ -350,73 +774,77 @@ async def get_report_setAuth(auth0_user, data: SavedReportIDs, db: Session):
                 "is_public": self_report.is_public,
                 "rating": self_report.rating,
             },
-        }]
+        }
 
-    # Fetch additional NumerologyReport records
+    # If only self-report is requested
+    if is_self:
+        return [self_report_entry(create_report_tokens([self_report.id])[str(self_report.id)])]
+
+    # Fetch additional NumerologyReport records, saved ids are excluded and the page is cut in SQL
     n_reports_ids = user.n_reports or []  # Ensure it's a list
-    # Remove saved_report_ids from n_reports_ids
-    filtered_n_reports_ids = [id_ for id_ in n_reports_ids if str(id_) not in saved_report_ids]
-    
     additional_reports = []
     if n_reports_ids:
-        additional_reports = (
-            db.query(NumerologyReport)
-            .filter(NumerologyReport.id.in_(filtered_n_reports_ids))  # Query the reduced list
-            .all()
+        query = (
+            select(NumerologyReport)
+            .options(selectinload(NumerologyReport.sub_report))
+            .filter(NumerologyReport.id.in_(n_reports_ids))
         )
-    
-    
-    # print(n_reports_ids, additional_reports)
+        saved_uuids = parse_uuids(saved_report_ids)
+        if saved_uuids:
+            query = query.filter(NumerologyReport.id.not_in(saved_uuids))
+        query = query.order_by(NumerologyReport.created_at.desc(), NumerologyReport.id).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        additional_reports = (await db.scalars(query)).all()
+
+    # old reports without a sub_report are rebuilt from their users, loaded in one query
+    fallback_user_ids = {report.user_id for report in additional_reports if not report.sub_report and report.user_id}
+    fallback_users = {}
+    if fallback_user_ids:
+        fallback_users = {
+            u.id: u for u in (await db.scalars(select(User).filter(User.id.in_(fallback_user_ids)))).all()
+        }
 
     # Helper function to process report data
-    def process_report_data(report):
+    async def process_report_data(report):
         """Process the report and extract report_data."""
-        if isinstance(report, NumerologyReport):
-            # Fetch sub_report and user details
-            sub_report = report.sub_report
-            if not sub_report:
-                # Fallback: use user details to generate report
-                user_data = db.query(User).filter(User.id == report.user_id).first()
-                if user_data:
-                    person_obj = Person(user_data.dob, user_data.gender, user_data.name)
-                    return person_obj.get_all_data()
-            else:
-                # Parse JSON data and replace name
-                try:
-                    report_data = sub_report.report_data
-                    report_data["person_info"]["name"] = report.person_name
-                    return report_data
-                except (KeyError, TypeError, json.JSONDecodeError):
-                    raise HTTPException(status_code=500, detail="Invalid sub-report data format")
-        return None  
+        sub_report = report.sub_report
+        if not sub_report:
+            # Fallback: use user details to generate report
+            user_data = fallback_users.get(report.user_id)
+            if user_data:
+                report_data, _ = await compute_executor.run(
+                    build_report_data, user_data.dob, user_data.gender, user_data.name
+                )
+                return report_data
+            return None
+        # Parse JSON data and replace name
+        try:
+            report_data = hydrate_report_data(sub_report.report_data)
+            report_data["person_info"]["name"] = report.person_name
+            return report_data
+        except (KeyError, TypeError, json.JSONDecodeError):
+            raise HTTPException(status_code=500, detail="Invalid sub-report data format")
+
+    include_self = offset == 0 and str(self_report.id) not in saved_report_ids
+    tokens = create_report_tokens(
+        ([self_report.id] if include_self else []) + [report.id for report in additional_reports]
+    )
 
     # Initialize response list
     response_list = []
 
     # Add self-report to the response
-    if str(self_report.id) not in saved_report_ids:
-        self_report_token = create_jwt_token({"report_id": str(self_report.id)})
-        response_list.append({
-            "report_id": self_report.id,
-            "token": self_report_token,
-            "user_data": {
-                "report_data": self_report.report_data,
-                "is_authorized": True,
-                "is_auth_user": True,
-                "instagram": self_report.instagram_username,
-                "is_public": self_report.is_public,
-                "rating": self_report.rating,
-            },
-        })
+    if include_self:
+        response_list.append(self_report_entry(tokens[str(self_report.id)]))
 
     # Add additional reports to the response
     for report in additional_reports:
-        token = create_jwt_token({"report_id": str(report.id)})
         response_list.append({
             "report_id": report.id,
-            "token": token,
+            "token": tokens[str(report.id)],
             "user_data": {
-                "report_data": process_report_data(report),
+                "report_data": await process_report_data(report),
                 "is_authorized": True, 
                 "is_auth_user": False,
                 "is_temporary":report.is_temporary,
@@ -428,11 +856,21 @@ async def get_report_setAuth(auth0_user, data: SavedReportIDs, db: Session):
 
     return response_list
 
+def parse_uuids(values) -> list:
+    """UUIDs of values, skipping anything that isn't one (ids sent by the frontend)."""
+    uuids = []
+    for value in values:
+        try:
+            uuids.append(UUID(str(value)))
+        except ValueError:
+            continue
+    return uuids
+
 
 from fastapi import Query
 
 from sqlalchemy import or_, case
-async def search_reports_by_instagram(limit, offset, db: Session, username: str = Query(None)):
+async def search_reports_by_instagram(limit, offset, db: AsyncSession, username: str = Query(None)):
     """
     GET /search-reports?username=someusername
     """
@@ -445,12 +883,12 @@ async def search_reports_by_instagram(limit, offset, db: Session, username: str
         else_=2  # Partial match priority = 2
     )
     # Fetch reports ordered by the priority (exact matches first, then partial matches)
-    reports = db.query(NumerologyReport).filter(
+    reports = (await db.scalars(select(NumerologyReport).options(selectinload(NumerologyReport.sub_report)).filter(
         or_(
             NumerologyReport.instagram_username == username,  # Exact match
             NumerologyReport.instagram_username.like(f"%{username}%")  # Partial match
         )
-    ).order_by(priority).offset(offset).limit(limit).all()
+    ).order_by(priority).offset(offset).limit(limit))).all()
     
     # Prepare the result list
     result = [
@@ -480,8 +918,8 @@ async def search_reports_by_instagram(limit, offset, db: Session, username: str
 
 from .schemas import IssueReportReq
 
-async def report_issue(report_id: UUID, issue_dict:IssueReportReq, db: Session, payload: dict):
-    report = db.query(NumerologyReport).filter(NumerologyReport.id == report_id).first()
+async def report_issue(report_id: UUID, issue_dict:IssueReportReq, db: AsyncSession, payload: dict):
+    report = await db.get(NumerologyReport, report_id)
 
     if report is None:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -498,7 +936,7 @@ async def report_issue(report_id: UUID, issue_dict:IssueReportReq, db: Session,
     )
     
     db.add(issue_report)
-    db.commit()
+    await db.commit()
     
     return {"message": "Issue reported successfully"}
 
@@ -5,7 +5,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
-from .config import DATABASE_URL, REDIS_PORT, REDIS_HOST, REDIS_DB
+from .config import DATABASE_URL, REDIS_PORT, REDIS_HOST, REDIS_DB, REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
@@ -27,6 +27,9 @@ Base = declarative_base()
 
 
 # Dependency: Get the database session
+# sessions are lazy, a pooled connection is only checked out by the first query,
+# so requests answered from a cache never take one (ConnectionMetricsMiddleware counts them,
+# backend/tests/test_connection_metrics.py checks it for a GET /r/{id} cache hit)
 def get_db():
     db = SessionLocal()
     try:
@@ -53,18 +56,19 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 # Generate ASYNC_DATABASE_URL from DATABASE_URL for async use cases
 ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-# async_engine = create_async_engine(
-#     ASYNC_DATABASE_URL,
-#     pool_size=15,
-#     max_overflow=10,
-#     pool_timeout=30,
-#     pool_recycle=1800,
-#     pool_pre_ping=True
-# )
-async_engine = create_async_engine(ASYNC_DATABASE_URL)
+# same pool settings as the sync engine, routes share it through get_async_db
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=15,               # Maximum number of connections in the pool
+    max_overflow=10,            # Additional connections allowed beyond the pool
+    pool_timeout=30,            # Wait time before timeout when no connections are available
+    pool_recycle=1800,          # Recycle connections older than 30 minutes
+    pool_pre_ping=True          # Test connections before use to avoid stale connections
+)
 
 AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
 
+# lazy like get_db, the connection is checked out by the first query
 async def get_async_db():
     async with AsyncSessionLocal() as session:
         try:
@@ -74,29 +78,89 @@ async def get_async_db():
             raise e   
         finally:
             await session.close()
-            
 
-import redis
-from redis.exceptions import RedisError, ConnectionError
 
-class RedisClient:
+# --------------- connection metrics ---------------
+
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# pooled connections checked out while handling the current request
+_request_connections = ContextVar("request_connections", default=None)
+
+class ConnectionStats():
     def __init__(self):
+        self.requests = 0
+        self.requests_with_db = 0
+        self.connections = 0
+        self.max_per_request = 0
+
+    def record(self, connections):
+        self.requests += 1
+        if connections:
+            self.requests_with_db += 1
+            self.connections += connections
+            self.max_per_request = max(self.max_per_request, connections)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "requests_with_db": self.requests_with_db,
+            "connections": self.connections,
+            "avg_per_request": round(self.connections / self.requests, 3) if self.requests else 0.0,
+            "max_per_request": self.max_per_request,
+            "pool": {"async": async_engine.pool.status(), "sync": engine.pool.status()},
+        }
+
+connection_stats = ConnectionStats()
+
+def _count_checkout(*args):
+    counter = _request_connections.get()
+    if counter is not None:
+        counter[0] += 1
+
+event.listen(engine, "checkout", _count_checkout)
+event.listen(async_engine.sync_engine, "checkout", _count_checkout)
+
+class ConnectionMetricsMiddleware():
+    """ASGI middleware counting the pooled connections every HTTP request checks out."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # a list, so checkouts in worker threads (sync dependencies) add to the same counter
+        counter = [0]
+        token = _request_connections.set(counter)
         try:
-            self.pool = redis.ConnectionPool(
-                host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True
-            )
-            self.client = redis.Redis(connection_pool=self.pool)
-        except RedisError as e:
-            print(f"Redis connection error: {e}")
-            self.client = None
+            await self.app(scope, receive, send)
+        finally:
+            _request_connections.reset(token)
+            connection_stats.record(counter[0])
+            
+
+import redis.asyncio as redis
+
+# one client (and connection pool) per process, created in the lifespan
+redis_client = None
+
+def init_redis():
+    global redis_client
+    # bounded pool, requests wait for a free connection instead of opening new ones
+    pool = redis.BlockingConnectionPool(
+        host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB,  # values are bytes (json.loads / int take them as is)
+        max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT
+    )
+    redis_client = redis.Redis(connection_pool=pool)
 
-    def get_client(self):
-        if not self.client:
-            raise ConnectionError("Redis client is not initialized.")
-        return self.client
+async def close_redis():
+    global redis_client
+    if redis_client is not None:
+        await redis_client.aclose()
+        redis_client = None
 
 
-# Dependency function  
+# Dependency function, None before the lifespan started it (callers fall back to the database)
 def get_redis_client() -> redis.Redis:
-    redis_client = RedisClient()
-    return redis_client.get_client()
+    return redis_client
@@ -1,22 +1,23 @@
 #email_handler.py
  
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 from .models import EmailSubscription
-from backend.utils.Numerology import Person
+from .compute import compute_executor, build_report_text
 
-async def handle_email_subscription(email: str, db: Session):
-    if db.query(EmailSubscription).filter(EmailSubscription.email == email).first():
+async def handle_email_subscription(email: str, db: AsyncSession):
+    if await db.get(EmailSubscription, email):
         raise HTTPException(status_code=409, detail="Email already subscribed!")
     
     subscription = EmailSubscription(email=email)
     db.add(subscription)
-    db.commit() 
+    await db.commit() 
     return {"message": "Subscribed!"}
 
 async def handle_email_sending(user_data: dict, email: str):
-    person_obj = Person(user_data.get('dob'), user_data.get('gender'), user_data.get('name'))
-    report_content = person_obj.to_str()
+    report_content = await compute_executor.run(
+        build_report_text, user_data.get('dob'), user_data.get('gender'), user_data.get('name')
+    )
     await send_email(email, report_content)
 
 
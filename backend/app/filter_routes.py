@@ -1,10 +1,12 @@
 #filter_routes.py
 
-import redis
+import redis.asyncio as redis
 from fastapi import APIRouter, Depends, Query, Request
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, JSONResponse
 from geoalchemy2.functions import ST_DWithin, ST_Point
 from typing import Optional
 
@@ -14,11 +16,19 @@ import math
 from .models import NumerologyReport, NumerologyReportAuth, SubReport
 
 from .schemas import *
-from .database import get_db, get_redis_client
+from .database import AsyncSessionLocal, get_redis_client
 from .limiter import limiter
 
 import json
+import gzip
+import random
+import asyncio
 import hashlib
+import secrets
+from .config import (
+    GZIP_MIN_SIZE, FREPORTS_STALE_TTL, FREPORTS_LOCK_TTL, FREPORTS_LOCK_WAIT,
+    FREPORTS_WARM_KEYS, FREPORTS_WARM_INTERVAL, FREPORTS_WARM_AHEAD, FREPORTS_WARM_JITTER, FREPORTS_TRACKED_KEYS
+    )
 
 router = APIRouter()
 
@@ -36,12 +46,240 @@ def determine_ttl(filters: dict) -> int:
         return 30  # 1 minute
     return 80  # Default 5 minutes
 
+def cached_response(body: bytes, gzipped: bool = False) -> Response:
+    """Sends cached (already encoded) JSON as is, GZipMiddleware leaves responses with a Content-Encoding alone."""
+    headers = {"Vary": "Accept-Encoding"}
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# --------------- cache entries, single-flight and stale-while-revalidate ---------------
+# <key> response body, <key>:gz its gzipped copy, both kept FREPORTS_STALE_TTL longer than the ttl,
+# <key>:fresh expires with the ttl, an entry without it is stale: served while one refresh rebuilds it
+# <key>:lock is held (across processes) by the request rebuilding the entry, its value is the holder's token
+
+# deletes the lock only while it's still ours, a rebuild slower than FREPORTS_LOCK_TTL lost it
+# (it expired and may be held by another process now)
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# cache key -> task rebuilding it in this process, concurrent misses await the same task
+_rebuilds = {}
+
+freports_cache_stats = {
+    "hits": 0, "stale_hits": 0, "misses": 0, "rebuilds": 0, "coalesced": 0, "waited": 0,
+    "tracked_keys": 0, "warm_refreshes": 0,
+}
+
+async def write_reports_cache(redis_client, cache_key, params: dict, ttl: int):
+    """Runs the filter queries (own session, it can outlive the request) and caches the result."""
+    async with AsyncSessionLocal() as db:
+        response_data = await get_public_reports_filter(db, redis_client, **params)
+    freports_cache_stats["rebuilds"] += 1
+
+    # encoded once, like FastAPI would, small bodies aren't gzipped (same as GZipMiddleware)
+    body = JSONResponse(response_data).body
+    gzipped_body = gzip.compress(body, compresslevel=9, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.setex(cache_key, ttl + FREPORTS_STALE_TTL, body)
+            if gzipped_body:
+                pipe.setex(cache_key + ":gz", ttl + FREPORTS_STALE_TTL, gzipped_body)
+            pipe.setex(cache_key + ":fresh", ttl, 1)
+            await pipe.execute()
+    except Exception as e:
+        print("Failed to write to Redis cache.", str(e))
+    return body, gzipped_body
+
+async def rebuild_reports_cache(redis_client, cache_key, params: dict, ttl: int, background: bool = False):
+    """
+    Rebuilds an entry once across processes (Redis lock). Without the lock a miss waits for
+    the other process' result (computes it itself after FREPORTS_LOCK_WAIT), a background refresh gives up.
+    """
+    lock_key = cache_key + ":lock"
+    token = secrets.token_hex(16)
+    try:
+        # SET NX returns None when the lock is already held
+        locked = bool(await redis_client.set(lock_key, token, nx=True, ex=FREPORTS_LOCK_TTL))
+    except Exception:
+        locked = True  # no Redis, nothing to coordinate with
+
+    if not locked:
+        if background:
+            return None
+        freports_cache_stats["waited"] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + FREPORTS_LOCK_WAIT
+        while loop.time() < deadline:
+            await asyncio.sleep(0.05)
+            try:
+                body, gzipped_body = await redis_client.mget(cache_key, cache_key + ":gz")
+            except Exception:
+                break
+            if body:
+                return body, gzipped_body
+
+    try:
+        return await write_reports_cache(redis_client, cache_key, params, ttl)
+    finally:
+        if locked:
+            try:
+                await redis_client.eval(RELEASE_LOCK, 1, lock_key, token)
+            except Exception:
+                pass
+
+def single_flight(redis_client, cache_key, params: dict, ttl: int, background: bool = False) -> asyncio.Task:
+    """The task rebuilding cache_key in this process, started if there's none yet."""
+    task = _rebuilds.get(cache_key)
+    if task is not None:
+        freports_cache_stats["coalesced"] += 1
+        return task
+    task = asyncio.create_task(rebuild_reports_cache(redis_client, cache_key, params, ttl, background))
+    _rebuilds[cache_key] = task
+    task.add_done_callback(lambda _: _rebuilds.pop(cache_key, None))
+    return task
+
+def log_refresh_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        print("Background refresh of /freports failed.", str(task.exception()))
+
+
+def freports_entry(
+    limit=10, offset=0, gender=None, haveInstagram=False, personName=None, uniqueSubReport=False,
+    includePublic=False, latitude=None, longitude=None, radius=None, age=None, splitPercentage=50, birthday=None
+):
+    """(cache key, get_public_reports_filter arguments, ttl) of a /freports query, defaults are the route's."""
+    # Generate cache key without null values
+    cache_key = generate_cache_key("/freports", {
+        "limit": limit, "offset": offset, "gender": gender,
+        "haveInstagram": haveInstagram, "personName": personName,
+        "uniqueSubReport": uniqueSubReport, "includePublic": includePublic,
+        "latitude": latitude, "longitude": longitude,
+        "radius": radius, "age": age, "birthday": birthday
+    })
+    filter = {
+        "limit": limit, "offset": offset, "gender": gender,
+        "haveInstagram": haveInstagram, "personName": personName,
+        "uniqueSubReport": uniqueSubReport, "includePublic": includePublic,
+        "latitude": latitude, "longitude": longitude,
+        "radius": radius, "age": age, "splitPercentage": splitPercentage,
+        "birthday": birthday
+    }
+    ttl = determine_ttl(filter)
+    # get_public_reports_filter arguments (age is minAge there)
+    params = dict(filter)
+    params["minAge"] = params.pop("age")
+    return cache_key, params, ttl
+
+
+# --------------- refresh-ahead warmer ---------------
+# the first feed pages (default filters, gender / haveInstagram combinations) are always warm,
+# the rest of the FREPORTS_WARM_KEYS budget goes to the keys with the most (recent) requests
+
+FREPORTS_WARM_SEEDS = [
+    freports_entry(gender=gender, haveInstagram=haveInstagram, includePublic=includePublic)
+    for gender in (None, "male", "female")
+    for haveInstagram in (False, True)
+    for includePublic in (False, True)
+]
+
+# cache key -> [requests, params, ttl], counts decay every cycle so keys that went cold drop out,
+# only filled while the warmer runs and capped at FREPORTS_TRACKED_KEYS (query params are client controlled)
+_key_requests = {}
+# keys with a refresh already scheduled
+_warm_scheduled = set()
+_warmer_running = False
+
+def track_request(cache_key, params: dict, ttl: int):
+    if not _warmer_running:
+        return
+    entry = _key_requests.get(cache_key)
+    if entry:
+        entry[0] += 1
+        return
+    if len(_key_requests) >= FREPORTS_TRACKED_KEYS:
+        # full, the least requested key makes room
+        del _key_requests[min(_key_requests, key=lambda key: _key_requests[key][0])]
+    _key_requests[cache_key] = [1, params, ttl]
+
+def warm_candidates() -> list:
+    """[(cache key, params, ttl)] to keep warm, seeds first, then the most requested keys."""
+    seeds = FREPORTS_WARM_SEEDS[:FREPORTS_WARM_KEYS]
+    seed_keys = {key for key, _, _ in seeds}
+    hottest = sorted(
+        ((key, entry) for key, entry in _key_requests.items() if key not in seed_keys),
+        key=lambda item: item[1][0], reverse=True
+    )[:max(FREPORTS_WARM_KEYS - len(seeds), 0)]
+    return seeds + [(key, params, ttl) for key, (_, params, ttl) in hottest]
+
+def decay_requests():
+    for key in list(_key_requests):
+        _key_requests[key][0] *= 0.8  # ~30s half-life with the default 10s interval
+        if _key_requests[key][0] < 0.5:
+            del _key_requests[key]
+    freports_cache_stats["tracked_keys"] = len(_key_requests)
+
+async def refresh_later(redis_client, cache_key, params: dict, ttl: int, delay: float):
+    try:
+        await asyncio.sleep(delay)
+        if await single_flight(redis_client, cache_key, params, ttl, background=True) is not None:
+            freports_cache_stats["warm_refreshes"] += 1
+    except Exception as e:
+        print("Refresh-ahead of /freports failed.", str(e))
+    finally:
+        _warm_scheduled.discard(cache_key)
+
+async def warm_cycle(redis_client):
+    """Schedules a refresh for every candidate expiring before the next cycle, FREPORTS_WARM_AHEAD s before expiry."""
+    candidates = [entry for entry in warm_candidates() if entry[0] not in _warm_scheduled]
+    if not candidates:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for cache_key, _, _ in candidates:
+            pipe.pttl(cache_key + ":fresh")
+        remaining = await pipe.execute()
+
+    for (cache_key, params, ttl), pttl in zip(candidates, remaining):
+        if pttl == -1:
+            continue  # no expiry, nothing to refresh
+        # cold (-2) now, otherwise shortly before expiry, the jitter spreads keys expiring together
+        due_in = max(pttl / 1000 - FREPORTS_WARM_AHEAD, 0) if pttl >= 0 else 0
+        if due_in > FREPORTS_WARM_INTERVAL:
+            continue  # the next cycle schedules it
+        delay = max(due_in - random.uniform(0, FREPORTS_WARM_JITTER), 0)
+        _warm_scheduled.add(cache_key)
+        asyncio.create_task(refresh_later(redis_client, cache_key, params, ttl, delay))
+
+async def run_freports_warmer():
+    """Background loop started in the lifespan, FREPORTS_WARM_KEYS=0 disables it."""
+    global _warmer_running
+    if FREPORTS_WARM_KEYS <= 0:
+        return
+    _warmer_running = True
+    try:
+        while True:
+            try:
+                redis_client = get_redis_client()
+                if redis_client is not None:
+                    await warm_cycle(redis_client)
+            except Exception as e:
+                print("Redis unavailable, /freports warmer skipped a cycle.", str(e))
+            decay_requests()
+            await asyncio.sleep(FREPORTS_WARM_INTERVAL + random.uniform(0, FREPORTS_WARM_JITTER))
+    finally:
+        _warmer_running = False
+        _key_requests.clear()
+
 
 @router.get("/freports")
 @limiter.limit("16/minute")
 async def read_public_reports_filter(
     request: Request,
-    db: Session = Depends(get_db),
     redis_client: redis.Redis = Depends(get_redis_client),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
@@ -57,48 +295,47 @@ async def read_public_reports_filter(
     splitPercentage: Optional[int] = Query(50),  # Default: 70% private, 30% public
     birthday: Optional[str] = Query(None),  
 ):
-    # Generate cache key without null values
-    cache_key = generate_cache_key("/freports", {
-        "limit": limit, "offset": offset, "gender": gender,
-        "haveInstagram": haveInstagram, "personName": personName,
-        "uniqueSubReport": uniqueSubReport, "includePublic": includePublic,
-        "latitude": latitude, "longitude": longitude,
-        "radius": radius, "age": age, "birthday": birthday
-    })
+    cache_key, params, ttl = freports_entry(
+        limit, offset, gender, haveInstagram, personName, uniqueSubReport, includePublic,
+        latitude, longitude, radius, age, splitPercentage, birthday
+    )
+    track_request(cache_key, params, ttl)
 
+    # entries are the response body (and its gzipped copy under :gz), a hit is sent without decoding / encoding
+    accepts_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
     try:
-        cached_response = redis_client.get(cache_key)
-        if cached_response:
+        keys = [cache_key, cache_key + ":fresh"] + ([cache_key + ":gz"] if accepts_gzip else [])
+        body, fresh, *gzipped_body = await redis_client.mget(keys)
+        if body:
+            if fresh:
+                freports_cache_stats["hits"] += 1
+            else:
+                # stale, served as is while one background refresh rebuilds it
+                freports_cache_stats["stale_hits"] += 1
+                single_flight(redis_client, cache_key, params, ttl, background=True).add_done_callback(log_refresh_error)
             # print("redis_cached_res")
-            return json.loads(cached_response)
+            if gzipped_body and gzipped_body[0]:
+                return cached_response(gzipped_body[0], gzipped=True)
+            return cached_response(body)
     except Exception as e:
         print("Redis unavailable, falling back to database.",str(e))
 
-    # Fetch filtered reports
-    response_data = await get_public_reports_filter(
-        db, redis_client, limit, offset, gender, haveInstagram, personName,
-        uniqueSubReport, includePublic, latitude, longitude, radius, age,
-        splitPercentage, birthday
-    )
-    try:
-        filter = {
-            "limit": limit, "offset": offset, "gender": gender,
-            "haveInstagram": haveInstagram, "personName": personName,
-            "uniqueSubReport": uniqueSubReport, "includePublic": includePublic,
-            "latitude": latitude, "longitude": longitude,
-            "radius": radius, "age": age, "splitPercentage": splitPercentage,
-            "birthday": birthday
-        }
-        redis_client.setex(cache_key, determine_ttl(filter), json.dumps(response_data))
-    except Exception as e:
-        print("Failed to write to Redis cache.", str(e))
-    
-    return response_data
+    # Fetch filtered reports, concurrent misses of the same key share one rebuild
+    freports_cache_stats["misses"] += 1
+    rebuilt = await asyncio.shield(single_flight(redis_client, cache_key, params, ttl))
+    if rebuilt is None:
+        # joined a background refresh that found another process holding the lock
+        rebuilt = await rebuild_reports_cache(redis_client, cache_key, params, ttl)
+    body, gzipped_body = rebuilt
+
+    if accepts_gzip and gzipped_body:
+        return cached_response(gzipped_body, gzipped=True)
+    return cached_response(body)
 
 
 
 async def get_public_reports_filter(
-    db: Session,
+    db: AsyncSession,
     redis_client: redis.Redis,
     limit: int,
     offset: int,
@@ -187,7 +424,7 @@ async def get_public_reports_filter(
 
 
     # Query for authorized reports
-    auth_query = db.query(NumerologyReportAuth).options(
+    auth_query = select(NumerologyReportAuth).options(
         joinedload(NumerologyReportAuth.auth_user)
     )
     if latitude and longitude and radius:
@@ -200,12 +437,12 @@ async def get_public_reports_filter(
         )
     auth_query = apply_common_conditions(auth_query, is_auth_report=True)
     auth_query = auth_query.order_by(NumerologyReportAuth.created_at.desc())
-    auth_reports = auth_query.offset(auth_offset).limit(auth_limit).all()
+    auth_reports = (await db.scalars(auth_query.offset(auth_offset).limit(auth_limit))).all()
 
     # Query for public reports
     public_reports = []
     if includePublic:
-        public_query = db.query(NumerologyReport)
+        public_query = select(NumerologyReport).options(selectinload(NumerologyReport.sub_report))
         if uniqueSubReport or birthday or minAge or gender:
             public_query = public_query.join(
                 SubReport, NumerologyReport.sub_report_id == SubReport.id
@@ -218,10 +455,10 @@ async def get_public_reports_filter(
             public_query = public_query.order_by(NumerologyReport.created_at.desc())
 
         public_query = apply_common_conditions(public_query, is_auth_report=False)
-        public_reports = public_query.offset(public_offset).limit(public_limit).all()
+        public_reports = (await db.scalars(public_query.offset(public_offset).limit(public_limit))).all()
 
     # Combine results
-    combined_reports = auth_reports + public_reports
+    combined_reports = list(auth_reports) + list(public_reports)
     if any([gender, haveInstagram, personName,
             uniqueSubReport, latitude, minAge,
             birthday]
@@ -230,19 +467,19 @@ async def get_public_reports_filter(
     else:
         # Pre-calculate total counts with caching
         try:
-            total_auth_reports = redis_client.get("total_auth_reports")
-            if total_auth_reports is None:
-                total_auth_reports = db.query(NumerologyReportAuth).count()
-                redis_client.setex("total_auth_reports", 1800, total_auth_reports)  # Cache for 5 minutes
-            else:
-                total_auth_reports = int(total_auth_reports)
-
-            total_public_reports = redis_client.get("total_public_reports")
-            if total_public_reports is None:
-                total_public_reports = db.query(NumerologyReport).count()
-                redis_client.setex("total_public_reports", 1800, total_public_reports)  # Cache for 5 minutes
-            else:
-                total_public_reports = int(total_public_reports)
+            # both counts in one round trip, missing ones are counted and written back in one pipeline
+            total_auth_reports, total_public_reports = await redis_client.mget("total_auth_reports", "total_public_reports")
+            async with redis_client.pipeline(transaction=False) as pipe:
+                if total_auth_reports is None:
+                    total_auth_reports = await db.scalar(select(func.count()).select_from(NumerologyReportAuth))
+                    pipe.setex("total_auth_reports", 1800, total_auth_reports)  # Cache for 30 minutes
+                if total_public_reports is None:
+                    total_public_reports = await db.scalar(select(func.count()).select_from(NumerologyReport))
+                    pipe.setex("total_public_reports", 1800, total_public_reports)  # Cache for 30 minutes
+                if len(pipe):
+                    await pipe.execute()
+            total_auth_reports = int(total_auth_reports)
+            total_public_reports = int(total_public_reports)
             
             total_reports = total_auth_reports + total_public_reports
         except Exception as e:
@@ -16,6 +16,31 @@ def create_jwt_token(data: dict):
     return token
 
 
+import time
+from collections import OrderedDict
+
+# report id -> (token, minted at), a report's token is reused for a day instead of signing a new one per request
+REPORT_TOKEN_REUSE = 24 * 60 * 60
+REPORT_TOKEN_CACHE_SIZE = 10000
+_report_tokens = OrderedDict()
+
+def create_report_tokens(report_ids) -> dict:
+    """report id (str) -> token of {"report_id": id}, only ids without a recent token are signed."""
+    now = time.time()
+    tokens = {}
+    for report_id in map(str, report_ids):
+        cached = _report_tokens.get(report_id)
+        if cached and now - cached[1] < REPORT_TOKEN_REUSE:
+            _report_tokens.move_to_end(report_id)
+            tokens[report_id] = cached[0]
+            continue
+        tokens[report_id] = create_jwt_token({"report_id": report_id})
+        _report_tokens[report_id] = (tokens[report_id], now)
+        if len(_report_tokens) > REPORT_TOKEN_CACHE_SIZE:
+            _report_tokens.popitem(last=False)
+    return tokens
+
+
 def decode_jwt_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi.middleware.gzip import GZipMiddleware
 from slowapi.middleware import SlowAPIMiddleware
@@ -10,16 +11,25 @@ from .routes import router as api_router
 from .a_routes import router as auth_router  
 from .db_routes import router as db_router
 # from .f_routes import router as social_router # for social relations
-from .filter_routes import router as filter_router
+from .filter_routes import router as filter_router, run_freports_warmer
 
-from .database import init_db, engine , get_redis_client
+from .database import init_db, engine , init_redis, close_redis, ConnectionMetricsMiddleware
 from .limiter import limiter  # Import the limiter
+from .config import GZIP_MIN_SIZE
+from .compute import compute_executor
+from .bloom import rebuild_id_filters
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()   
+    init_redis()  # shared async Redis client (bounded pool)
+    await rebuild_id_filters()  # existing report / match ids, unknown ids are 404 without a query
+    await compute_executor.start()  # warm workers (dob features, score tables) before serving
+    warmer = asyncio.create_task(run_freports_warmer())  # keeps the hot /freports pages cached
     yield
-    # Any cleanup can be added here if needed
+    warmer.cancel()
+    await compute_executor.shutdown()
+    await close_redis()
 
 # Initialize FastAPI app
 app = FastAPI(lifespan=lifespan)
@@ -62,8 +72,9 @@ app.add_middleware(
 
 
 # Middleware setup
-app.add_middleware(GZipMiddleware, minimum_size=400)  # Compress responses  
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)  # Compress responses  
 app.add_middleware(SlowAPIMiddleware)
+app.add_middleware(ConnectionMetricsMiddleware)  # pooled connections per request, see /api/db-stats
 
 # Rate Limiting
 app.state.limiter = limiter
@@ -2,7 +2,7 @@
 # from datetime import datetime, timezone
 from .database import Base, DATABASE_URL
 from geoalchemy2 import Geography
-from sqlalchemy import  Column, Table, DateTime, Integer, String, Boolean, ForeignKey, JSON
+from sqlalchemy import  Column, Table, DateTime, Integer, String, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
@@ -90,6 +90,10 @@ class User(Base):
     dob = Column(String(10))
     gender = Column(String(8))
 
+    __table_args__ = (
+        Index("uq_users_person", "name", "dob", "gender", unique=True),
+    )
+
     
 class NumerologyReport(Base):
     __tablename__ = "numerology_reports"
@@ -119,6 +123,11 @@ class SubReport(Base):
     dob = Column(String,nullable=True, index=True)  
     gender = Column(String,nullable=True, index=True)
 
+    # one report per dob and gender
+    __table_args__ = (
+        Index("uq_sub_reports_dob_gender", "dob", "gender", unique=True),
+    )
+
 # --------------- MATCHING ---------
 
 class CompatibilityReport(Base):
@@ -147,6 +156,11 @@ class SubMatch(Base):
     
     dob2 = Column(String,nullable=True, index=True)  
     gender2 = Column(String,nullable=True, index=True)
+
+    # pairs are stored in canonical order ((dob1, gender1) <= (dob2, gender2)), so A-B and B-A share one row
+    __table_args__ = (
+        Index("uq_sub_matches_pair", "dob1", "gender1", "dob2", "gender2", unique=True),
+    )
     
 
 
@@ -7,7 +7,11 @@ from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from .schemas import *
 
 from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import redis.asyncio as redis
+from .database import get_db, get_async_db, get_redis_client, connection_stats
+from .filter_routes import freports_cache_stats
 
 from .authorization import JWTBearer
 
@@ -18,10 +22,10 @@ router = APIRouter()
 
 @router.post("/profile")
 @limiter.limit("6/minute")
-async def get_picture(request: Request ,user_d: GetProfilePic , db: Session = Depends(get_db)):
+async def get_picture(request: Request ,user_d: GetProfilePic , db: AsyncSession = Depends(get_async_db)):
     try:
         # print(vars(user_d))
-        existing_user = db.query(AuthUser).filter(AuthUser.auth0_id == user_d.id).first()
+        existing_user = (await db.scalars(select(AuthUser).filter(AuthUser.auth0_id == user_d.id))).first()
         if existing_user is None:
             return {"picture":''} 
         return {"picture":existing_user.picture}           
@@ -31,12 +35,22 @@ async def get_picture(request: Request ,user_d: GetProfilePic , db: Session = De
  
 @router.post("/report")
 @limiter.limit("6/minute")
-async def create_report(request: Request ,report: ReportCreate, db: Session = Depends(get_db)):
+async def create_report(request: Request ,report: ReportCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         return await generate_report(report, db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Report generation failed: {e}")
  
+@router.post("/r/batch")
+@limiter.limit("10/minute")
+async def get_by_uuids(
+    request:Request, batch: BatchReportRequest,
+    db: AsyncSession = Depends(get_async_db),
+    redis_client: redis.Redis = Depends(get_redis_client)
+    ):
+    # per report results (200 / 403 / 404), one request instead of one /r/{id} per saved report
+    return await get_reports_batch(batch, db, redis_client)
+
 # DEPRECIATED
 # @router.get("/reports")
 # @limiter.limit("10/minute")
@@ -52,7 +66,7 @@ async def read_search_reports(
     username: str = Query(None),
     limit: int = Query(15, ge=0, le=20),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     return await search_reports_by_instagram( limit, offset, db, username)
 
@@ -61,10 +75,11 @@ async def read_search_reports(
 @limiter.limit("8/minute")
 async def get_by_uuid(
     request:Request, report_id: UUID, 
-    db: Session = Depends(get_db), 
-    payload: dict = Depends(JWTBearer())
+    db: AsyncSession = Depends(get_async_db), 
+    payload: dict = Depends(JWTBearer()),
+    redis_client: redis.Redis = Depends(get_redis_client)
     ):
-    return await get_report(report_id, db, payload)
+    return await get_report(report_id, db, payload, redis_client)
 
 
 # @router.get("/gen-summary/{report_id}")
@@ -80,12 +95,13 @@ async def get_by_uuid(
 @limiter.limit("5/minute")
 async def rem_summary(
     request:Request, report_id: UUID, 
-    db: Session = Depends(get_db), 
-    payload: dict = Depends(JWTBearer())
+    db: AsyncSession = Depends(get_async_db), 
+    payload: dict = Depends(JWTBearer()),
+    redis_client: redis.Redis = Depends(get_redis_client)
 ):
     try:
         # Fetch the report by ID
-        report = db.query(NumerologyReportAuth).filter(NumerologyReportAuth.id == report_id).first()
+        report = await db.get(NumerologyReportAuth, report_id)
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
 
@@ -95,7 +111,8 @@ async def rem_summary(
 
         report.summary = None
         report.updated_at = datetime.now(timezone.utc)
-        db.commit()
+        await db.commit()
+        await invalidate_report_cache(redis_client, report_id)
         return {"status": "success" }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
@@ -169,7 +186,7 @@ async def issue_report(
     request: Request,  
     report_id: UUID, 
     issue_data:IssueReportReq,
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     payload: dict = Depends(JWTBearer())
 ):
     return await report_issue(report_id, issue_data, db, payload)
@@ -183,26 +200,43 @@ async def issue_report(
 async def delete_compatibility_report(
     request: Request,
     match_id: UUID, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    redis_client: redis.Redis = Depends(get_redis_client)
 ): 
-    return await remove_match(match_id, db)
+    return await remove_match(match_id, db, redis_client)
 
 @router.post("/match")
 @limiter.limit("6/minute")
 async def create_compatibility_report(request: Request,
         match_request: CompatibilityMatchRequest, 
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
     ):
     return await generate_compatibility_report(match_request, db)
+
+@router.post("/match/rank")
+@limiter.limit("4/minute")
+async def rank_compatibility_matches(request: Request,
+        rank_request: CompatibilityRankRequest, 
+        db: AsyncSession = Depends(get_async_db)
+    ):
+    return await rank_matches(rank_request, db)
+
+@router.post("/match/group")
+@limiter.limit("4/minute")
+async def group_compatibility_matrix(request: Request,
+        group_request: GroupMatchRequest
+    ):
+    return await generate_group_compatibility(group_request)
     
     
 @router.get("/m/{match_id}")
 @limiter.limit("6/minute")
 async def get_match_uuid(
     request:Request, match_id: UUID, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    redis_client: redis.Redis = Depends(get_redis_client)
     ):
-    return await get_match(match_id, db)
+    return await get_match(match_id, db, redis_client)
 
 
 # --------------------  EMAIL RELATED ------------
@@ -217,28 +251,25 @@ async def email_send(
     request :Request,
     report_id: UUID, eml_req: EmailRequest, 
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     payload: dict = Depends(JWTBearer())
 ):
     # Validate report existence and permission before adding the background task
     raise HTTPException(status_code=400, detail="Implementation Moved!.")
 
-    report = db.query(NumerologyReport).filter(NumerologyReport.id == report_id).first()
-    if report is None:
-        report = db.query(NumerologyReportAuth).filter(NumerologyReportAuth.id == report_id).first()
-
+    report = await find_report(db, report_id)
     if report is None:
         raise HTTPException(status_code=404, detail=f"Report with ID {report_id} not found.")
     
     if not payload or str(report.id) != payload.get('report_id'):
         raise HTTPException(status_code=403, detail="Permission denied. Not your report.")
 
-    user = db.query(User).filter(User.id == report.user_id).first()
+    user = await db.get(User, report.user_id)
     # print(report, report.user_id, user)
     if user:
         subscription = EmailSubscription(report_id = report_id, email = eml_req.email)
         db.add(subscription)
-        db.commit()
+        await db.commit()
         user_data = {'name':user.name, 'dob':user.dob, 'gender':user.gender}
         background_tasks.add_task(handle_email_sending, user_data, eml_req.email)
         return {"message": "Email sending task has been initiated."}
@@ -250,7 +281,7 @@ async def email_send(
     
 @router.post("/email")
 @limiter.limit("5/minute")
-async def email_subscribe(request:Request, eml_req: EmailRequest, db: Session = Depends(get_db) ):
+async def email_subscribe(request:Request, eml_req: EmailRequest, db: AsyncSession = Depends(get_async_db) ):
     return await handle_email_subscription(eml_req.email , db)
   
   
@@ -259,10 +290,39 @@ async def email_subscribe(request:Request, eml_req: EmailRequest, db: Session =
 
 # ------------------testing--------------
 from typing import List 
+from .config import STATS_ENDPOINTS
+
+def stats_endpoints_enabled():
+    """Internal counters (pools, queues, caches) are only served with STATS_ENDPOINTS=1, 404 otherwise."""
+    if not STATS_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@router.get("/cache-stats", dependencies=[Depends(stats_endpoints_enabled)], include_in_schema=STATS_ENDPOINTS)
+@limiter.limit("10/minute")
+async def get_cache_stats(request: Request):
+    # per worker counters of the in-process caches
+    return {
+        "person_cache": person_cache.stats(),
+        "report_ids": report_ids.stats(),
+        "match_ids": match_ids.stats(),
+        "freports": freports_cache_stats,
+    }
+
+@router.get("/compute-stats", dependencies=[Depends(stats_endpoints_enabled)], include_in_schema=STATS_ENDPOINTS)
+@limiter.limit("10/minute")
+async def get_compute_stats(request: Request):
+    # queue depth, batching and queue wait time of the compute executor
+    return {"compute": compute_executor.stats()}
+
+@router.get("/db-stats", dependencies=[Depends(stats_endpoints_enabled)], include_in_schema=STATS_ENDPOINTS)
+@limiter.limit("10/minute")
+async def get_db_stats(request: Request):
+    # pooled connections checked out per request (cache hits take none)
+    return {"db": connection_stats.stats()}
     
 @router.post("/bulk-rpt")
 @limiter.limit("5/minute")
-async def create_bulk_report(request: Request, reports: List[ReportCreate], db: Session = Depends(get_db)):
+async def create_bulk_report(request: Request, reports: List[ReportCreate], db: AsyncSession = Depends(get_async_db)):
     try:
         results = []
         # print(reports)
@@ -297,7 +357,7 @@ def generate_random_username():
                            
 @router.post("/bulk-ic")
 @limiter.limit("3/minute")
-async def make_reports_public(request: Request, db: Session = Depends(get_db)):
+async def make_reports_public(request: Request, db: AsyncSession = Depends(get_async_db), redis_client: redis.Redis = Depends(get_redis_client)):
     try:
         # Load the previously generated reports from JSON file
         with open("bulk_report_results.json", "r") as f:
@@ -306,7 +366,7 @@ async def make_reports_public(request: Request, db: Session = Depends(get_db)):
         # Iterate through the results to update visibility and social links
         for result in results:
             report_id = result["report_id"]
-            report = db.query(NumerologyReport).filter(NumerologyReport.id == UUID(report_id)).first()
+            report = await db.get(NumerologyReport, UUID(report_id))
             
             if report is None:
                 print(f"Report with ID {report_id} not found.")
@@ -315,7 +375,8 @@ async def make_reports_public(request: Request, db: Session = Depends(get_db)):
             # Make report public and assign a random Instagram username
             report.is_public = True
             report.instagram_username = generate_random_username()
-            db.commit()
+            await db.commit()
+            await invalidate_report_cache(redis_client, report.id)
 
         return {"message": "All reports updated to public with random social links."}
     
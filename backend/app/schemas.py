@@ -130,6 +130,23 @@ class CompatibilityMatchRequest(BaseModel):
     person_1: PersonData
     person_2: PersonData
 
+class RankFilters(BaseModel):
+    """ Filters over stored public reports, used as candidates for ranking """
+    gender: Optional[str] = None
+    haveInstagram: bool = False
+    personName: Optional[str] = Field(None, max_length=30)
+    age: Optional[int] = Field(None, ge=0, le=130)
+    limit: int = Field(1000, ge=1, le=5000)
+
+class CompatibilityRankRequest(BaseModel):
+    person: PersonData
+    candidates: Optional[List[PersonData]] = Field(None, max_length=5000)
+    filters: Optional[RankFilters] = None
+    top_k: int = Field(10, ge=1, le=100)
+
+class GroupMatchRequest(BaseModel):
+    people: List[PersonData] = Field(..., min_length=2, max_length=200)
+
 class ReportOut(BaseModel):
     report_id: int
     report_data: str
@@ -158,6 +175,13 @@ class ReportVisibility(BaseModel):
     class Config:
         from_attributes = True
  
+class ReportRef(BaseModel):
+    report_id: UUID
+    token: Optional[str] = None
+
+class BatchReportRequest(BaseModel):
+    reports: List[ReportRef] = Field(..., min_length=1, max_length=50)
+
 class SavedReportIDs(BaseModel):
     saved_report_ids: Optional[List[str]] = None  
     is_self: Optional[bool] = False
@@ -26,6 +26,11 @@ echo "Starting FastAPI Backend..."
 
 # ls -la /code 
 
+# Migrate existing databases (unique indexes, deduplication) before serving,
+# new databases get their tables from create_all at startup
+echo "Running database migrations..."
+alembic upgrade head
+
 # Start the Uvicorn server
 # exec uvicorn app.main:app --host 0.0.0.0 --port 8000
 
@@ -0,0 +1,75 @@
+# test_connection_metrics.py
+"""
+Pooled connections counted by ConnectionMetricsMiddleware: sessions are lazy, so a request answered
+from the cache takes none. Needs the configured database (DATABASE_URL, PostgreSQL) for the miss,
+run from the repository root: python -m pytest backend/tests
+"""
+import json
+import os
+import uuid
+
+import pytest
+
+# the app modules need DATABASE_URL when they're imported, so it's checked before importing them
+if "postgresql" not in os.environ.get("DATABASE_URL", ""):
+    pytest.skip("needs PostgreSQL in DATABASE_URL", allow_module_level=True)
+
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.database import get_redis_client, connection_stats, async_engine
+from backend.app.controllers import report_cache_key
+
+
+class CachedReports():
+    """Redis stand-in holding the cached GET /r/{id} payloads."""
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    async def get(self, key):
+        return self.payloads.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.payloads[key] = value
+
+
+def cached_report(report_id):
+    return json.dumps({
+        "report_id": str(report_id),
+        "user_data": {
+            "report_data": {"person_info": {"name": "Cached", "dob": "1990-04-12", "gender": "Female"}},
+            "is_authorized": False,
+            "is_auth_user": False,
+            "summary": None,
+            "is_temporary": True,
+            "instagram": None,
+            "is_public": True,
+            "rating": 3,
+        },
+    })
+
+
+def test_cache_hit_checks_out_no_connection():
+    cached_id, missing_id = uuid.uuid4(), uuid.uuid4()
+    cache = CachedReports({report_cache_key(cached_id): cached_report(cached_id)})
+    app.dependency_overrides[get_redis_client] = lambda: cache
+    # no lifespan (the TestClient isn't entered), the routes only get the cache above
+    client = TestClient(app)
+    try:
+        before = connection_stats.stats()
+        response = client.get(f"/api/r/{cached_id}")
+        after_hit = connection_stats.stats()
+        assert response.status_code == 200
+        assert response.json()["user_data"]["report_data"]["person_info"]["name"] == "Cached"
+        assert after_hit["requests"] == before["requests"] + 1
+        assert after_hit["connections"] == before["connections"]
+
+        # a miss goes to the database, and its connection is counted
+        assert client.get(f"/api/r/{missing_id}").status_code == 404
+        after_miss = connection_stats.stats()
+        assert after_miss["requests"] == after_hit["requests"] + 1
+        assert after_miss["connections"] > after_hit["connections"]
+    finally:
+        app.dependency_overrides.pop(get_redis_client, None)
+        # the pooled connections belong to the TestClient's event loop, which is gone now
+        async_engine.sync_engine.dispose(close=False)
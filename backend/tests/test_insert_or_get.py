@@ -0,0 +1,113 @@
+# test_insert_or_get.py
+"""
+Concurrent get-or-create (insert_or_get) against the configured database (DATABASE_URL, PostgreSQL),
+run from the repository root: python -m pytest backend/tests
+"""
+import asyncio
+import os
+import random
+
+import pytest
+
+# the app modules need DATABASE_URL when they're imported, so it's checked before importing them
+if "postgresql" not in os.environ.get("DATABASE_URL", ""):
+    pytest.skip("needs PostgreSQL in DATABASE_URL (ON CONFLICT races)", allow_module_level=True)
+
+from sqlalchemy import select, delete, func
+from backend.app.database import AsyncSessionLocal, async_engine, init_db
+from backend.app.models import User, SubReport, NumerologyReport, SubMatch, CompatibilityReport
+from backend.app.schemas import ReportCreate, CompatibilityMatchRequest, PersonData
+from backend.app.controllers import generate_report, generate_compatibility_report
+
+N = 100
+
+
+async def generate(report):
+    async with AsyncSessionLocal() as db:
+        return await generate_report(report, db)
+
+async def match(request):
+    async with AsyncSessionLocal() as db:
+        return await generate_compatibility_report(request, db)
+
+async def warm_pool():
+    # connections already open (like a running server), so the racing transactions really overlap
+    async def ping():
+        async with AsyncSessionLocal() as db:
+            await db.execute(select(1))
+    await asyncio.gather(*[ping() for _ in range(N)])
+
+async def count(db, model, **key):
+    return await db.scalar(select(func.count()).select_from(model).filter_by(**key))
+
+
+async def unused_dob(db):
+    """A dob no user or sub report has yet, so every request misses and races to insert (and cleanup owns it)."""
+    while True:
+        dob = f"{random.randint(1900, 2000)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+        if not await count(db, User, dob=dob) and not await count(db, SubReport, dob=dob):
+            return dob
+
+
+def test_parallel_generate_report_creates_one_user_and_sub_report():
+    async def run():
+        await init_db()
+        async with AsyncSessionLocal() as db:
+            dob = await unused_dob(db)
+        report = ReportCreate(name="racer", dob=dob, gender="female")
+        try:
+            results = await asyncio.gather(*[generate(report) for _ in range(N)])
+            assert len({result["report_id"] for result in results}) == N
+
+            async with AsyncSessionLocal() as db:
+                assert await count(db, User, name="Racer", dob=dob, gender="Female") == 1
+                assert await count(db, SubReport, dob=dob, gender="Female") == 1
+                sub_report_id = await db.scalar(select(SubReport.id).filter_by(dob=dob, gender="Female"))
+                assert await count(db, NumerologyReport, sub_report_id=sub_report_id) == N
+        finally:
+            async with AsyncSessionLocal() as db:
+                user_ids = select(User.id).filter_by(dob=dob).scalar_subquery()
+                await db.execute(delete(NumerologyReport).where(NumerologyReport.user_id.in_(user_ids)))
+                await db.execute(delete(User).filter_by(dob=dob))
+                await db.execute(delete(SubReport).filter_by(dob=dob))
+                await db.commit()
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_parallel_reversed_matches_share_one_sub_match():
+    async def run():
+        await init_db()
+        async with AsyncSessionLocal() as db:
+            dob_a = await unused_dob(db)
+            dob_b = await unused_dob(db)
+        a = PersonData(name="Ann", dob=dob_a, gender="female")
+        b = PersonData(name="Bob", dob=dob_b, gender="male")
+        # both users and the pair are new, A-B and B-A requests race on the same rows
+        requests = [CompatibilityMatchRequest(person_1=a, person_2=b), CompatibilityMatchRequest(person_1=b, person_2=a)]
+        await warm_pool()
+        try:
+            results = await asyncio.gather(*[match(requests[i % 2]) for i in range(N)])
+            assert len({result["match_id"] for result in results}) == N
+            # every response is seen from its own person_1
+            assert all(result["match_data"] == results[i % 2]["match_data"] for i, result in enumerate(results))
+
+            async with AsyncSessionLocal() as db:
+                assert await count(db, User, dob=dob_a) == 1
+                assert await count(db, User, dob=dob_b) == 1
+                first, second = sorted([(dob_a, "female"), (dob_b, "male")])
+                key = {"dob1": first[0], "gender1": first[1], "dob2": second[0], "gender2": second[1]}
+                assert await count(db, SubMatch, **key) == 1
+                sub_match_id = await db.scalar(select(SubMatch.id).filter_by(**key))
+                assert await count(db, CompatibilityReport, sub_match_id=sub_match_id) == N
+        finally:
+            async with AsyncSessionLocal() as db:
+                user_ids = select(User.id).filter(User.dob.in_([dob_a, dob_b])).scalar_subquery()
+                await db.execute(delete(CompatibilityReport).where(CompatibilityReport.user1_id.in_(user_ids)))
+                await db.execute(delete(SubMatch).filter(SubMatch.dob1.in_([dob_a, dob_b])))
+                await db.execute(delete(User).filter(User.dob.in_([dob_a, dob_b])))
+                await db.commit()
+            await async_engine.dispose()
+
+    asyncio.run(run())
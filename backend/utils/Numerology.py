@@ -1,5 +1,9 @@
 
 import json
+import numpy as np
+from array import array
+from collections import OrderedDict
+from threading import Lock
 from backend.utils.data.planes_data import *
 from backend.utils.data.planet_data import *
 from backend.utils.data.compatibility_data import *
@@ -7,7 +11,10 @@ from backend.utils.data.compatibility_data import *
 # from data.planet_data import *
 # from data.compatibility_data import *
  
-from datetime import datetime
+from datetime import datetime, date
+
+# Standard Lo Shu grid, every number's cell is fixed
+STD_LOSHU_GRID = [[4, 9, 2], [3, 5, 7], [8, 1, 6]]
 
 # Helper function to validate the Date of Birth
 def validate_dob(dob):
@@ -20,16 +27,16 @@ def validate_dob(dob):
     except ValueError as e:
         raise ValueError(f"Invalid dob: {dob}. Error: {str(e)}")
 
+def get_digit_sum(num):
+    while num > 9:
+        num = sum(map(int, str(num)))
+    return num
+
 # Function to calculate Mulank (Psychic Number) and optionally Bhagyank (Destiny Number)
 def calc_mulank(dob, bhagyank_also=False):
     # Validate and split the date
     dd, mm, yy = validate_dob(dob)
         
-    def get_digit_sum(num):
-        while num > 9:
-            num = sum(map(int, str(num)))
-        return num
-        
     mulank = get_digit_sum(dd)
     
     if not bhagyank_also:
@@ -38,17 +45,470 @@ def calc_mulank(dob, bhagyank_also=False):
     bhagyank = get_digit_sum(mulank + get_digit_sum(mm) + get_digit_sum(yy))
     return mulank, bhagyank
 
+# Chaldean values of letters, for Namaank (Name Number)
+STD_CHALDEAN = {
+    1: ['A', 'I', 'J', 'Q', 'Y'],
+    2: ['B', 'K', 'R'],
+    3: ['C', 'G', 'L', 'S'],
+    4: ['D', 'M', 'T'],
+    5: ['E', 'H', 'N', 'X'],
+    6: ['U', 'V', 'W'],
+    7: ['O', 'Z'],
+    8: ['F', 'P']
+}
+CHALDEAN_VALUES = {letter: num for num, letters in STD_CHALDEAN.items() for letter in letters}
+
+def calc_namaank(name):
+    if name == "Unnamed":
+        return 0
+    total = sum(CHALDEAN_VALUES.get(char, 0) for char in name.upper())
+    return get_digit_sum(total)
+
+
+# ------------------  precomputed features (pure function of the dob)  ---------------
+
+# Identity planes and the numbers forming them
+STD_PLANES = {
+    'Mind': (4, 9, 2),
+    'Heart': (3, 5, 7),
+    'Practical': (8, 1, 6),
+    'Vision': (4, 3, 8),
+    'Will': (9, 5, 1),
+    'Action': (2, 7, 6),
+}
+PLANES_CATEGORIES = ["Mind", "Heart", "Practical", "Vision", "Will", "Action"]
+
+def numbers_to_mask(numbers):
+    """9-bit presence mask of Lo Shu numbers, bit (num - 1) is set for num."""
+    mask = 0
+    for num in numbers:
+        if 1 <= num <= 9:
+            mask |= 1 << (num - 1)
+    return mask
+
+def mask_to_numbers(mask):
+    return [num for num in range(1, 10) if mask >> (num - 1) & 1]
+
+# (rajyog_data key, numbers required), keys of rajyog_data are as checked by calculate_identity_planes
+IDENTITY_RAJYOG = (
+    ((8, 1, 6), numbers_to_mask((8, 1, 6))),
+    ((2, 5, 8), numbers_to_mask((4, 5, 6))),
+    ((4, 5, 6), numbers_to_mask((2, 5, 8))),
+)
+
+# Plane tuples and rajyog keys for every possible grid presence (2^9 masks)
+PLANE_TUPLES_BY_MASK = [
+    {plane: tuple(mask >> (num - 1) & 1 for num in numbers) for plane, numbers in STD_PLANES.items()}
+    for mask in range(512)
+]
+RAJYOG_KEYS_BY_MASK = [
+    tuple(key for key, required in IDENTITY_RAJYOG if mask & required == required)
+    for mask in range(512)
+]
+
+def calc_lucky_mask(mulank, bhagyank):
+    """Lucky numbers (as mask) are the ones neither enemy nor neutral to Mulank and Bhagyank."""
+    data = planets_compatibility
+    excluded = set()
+    for key in (mulank, bhagyank):
+        excluded.update(int(enemy) for enemy in data[key]["enemies"].split(","))
+        excluded.update(int(neutral) for neutral in data[key]["neutral"].split(","))
+    return numbers_to_mask(num for num in range(1, 10) if num not in excluded)
+
+
+class FeatureTable():
+    """
+    Array-backed numerology features of every valid DOB (1900-01-01 to the end of current year), indexed by day.
+    Holds mulank, bhagyank, Lo Shu counts (index num - 1), presence mask and lucky numbers mask,
+    plane tuples and rajyog flags of a day are PLANE_TUPLES_BY_MASK / RAJYOG_KEYS_BY_MASK of its mask.
+    Namaank depends on the name so it's overlaid by Person, gender isn't a key as kua number is disabled.
+    """
+    def __init__(self, start_year=1900, end_year=None):
+        self.start_year = start_year
+        self.end_year = end_year or datetime.now().year
+        self.base = date(self.start_year, 1, 1).toordinal()
+        self.size = date(self.end_year, 12, 31).toordinal() - self.base + 1
+
+        self.mulank = bytearray(self.size)
+        self.bhagyank = bytearray(self.size)
+        self.counts = bytearray(self.size * 9)
+        self.mask = array('H', bytes(2 * self.size))
+        self.lucky = array('H', bytes(2 * self.size))
+        self.build()
+
+    def build(self):
+        lucky_masks = {}
+        year_digits = {}
+        for idx in range(self.size):
+            day = date.fromordinal(self.base + idx)
+            mulank = get_digit_sum(day.day)
+            bhagyank = get_digit_sum(mulank + get_digit_sum(day.month) + get_digit_sum(day.year))
+
+            if day.year not in year_digits:
+                year_digits[day.year] = [int(ch) for ch in str(day.year)]
+            numbers = year_digits[day.year] + [int(ch) for ch in f"{day.month:02d}{day.day:02d}"] + [mulank, bhagyank]
+
+            offset = idx * 9
+            for num in numbers:
+                if num:
+                    self.counts[offset + num - 1] += 1
+
+            if (mulank, bhagyank) not in lucky_masks:
+                lucky_masks[(mulank, bhagyank)] = calc_lucky_mask(mulank, bhagyank)
+
+            self.mulank[idx] = mulank
+            self.bhagyank[idx] = bhagyank
+            self.mask[idx] = numbers_to_mask(numbers)
+            self.lucky[idx] = lucky_masks[(mulank, bhagyank)]
+
+    def index(self, dob):
+        """Day index of a YYYY-MM-DD dob, None if it's not in the table."""
+        if not isinstance(dob, str) or len(dob) != 10 or dob[4] != '-' or dob[7] != '-':
+            return None
+        try:
+            idx = date.fromisoformat(dob).toordinal() - self.base
+        except ValueError:
+            return None
+        return idx if 0 <= idx < self.size else None
+
+    def lookup(self, dob):
+        """Returns (mulank, bhagyank, counts, mask, lucky_mask) of the dob, None if not in the table."""
+        idx = self.index(dob)
+        if idx is None:
+            return None
+        offset = idx * 9
+        return (
+            self.mulank[idx], self.bhagyank[idx],
+            self.counts[offset:offset + 9], self.mask[idx], self.lucky[idx]
+        )
+
+
+_feature_table = None
+
+def get_feature_table():
+    """Process wide FeatureTable, built on first use (warmed in app lifespan)."""
+    global _feature_table
+    if _feature_table is None:
+        _feature_table = FeatureTable()
+    return _feature_table
+
+
+# ------------------  batch (vectorized) features  ---------------
+
+# plane tuples (in PLANES_CATEGORIES order) and identity rajyog flags of every presence mask, as arrays
+PLANE_BITS_BY_MASK = np.array(
+    [[PLANE_TUPLES_BY_MASK[mask][plane] for plane in PLANES_CATEGORIES] for mask in range(512)], dtype=np.uint8
+)
+RAJYOG_BITS_BY_MASK = np.array(
+    [[mask & required == required for _, required in IDENTITY_RAJYOG] for mask in range(512)], dtype=bool
+)
+
+_lucky_mask_lut = None
+
+def get_lucky_mask_lut():
+    """lucky numbers mask indexed by [mulank, bhagyank]."""
+    global _lucky_mask_lut
+    if _lucky_mask_lut is None:
+        lut = np.zeros((10, 10), dtype=np.uint16)
+        for mulank in range(1, 10):
+            for bhagyank in range(1, 10):
+                lut[mulank, bhagyank] = calc_lucky_mask(mulank, bhagyank)
+        _lucky_mask_lut = lut
+    return _lucky_mask_lut
+
+def digital_root(values):
+    """Vectorized get_digit_sum for positive integers."""
+    return 1 + (values - 1) % 9
+
+def compute_features(dobs, genders=None, namaanks=None):
+    """
+    Vectorized numerology features for many DOBs at once (same results as Person, no per-row objects).
+    dobs: array of "YYYY-MM-DD" strings or datetime64, genders: same length (unused while kua number is disabled),
+    namaanks: optional per-row namaank (0 for none) to overlay on the grid.
+    Returns dict of arrays: mulank, bhagyank (N,), counts (N, 9) with index num - 1, mask and lucky_mask (N,) 9-bit masks,
+    planes (N, 6, 3) plane tuples in PLANES_CATEGORIES order and rajyog (N, 3) flags in IDENTITY_RAJYOG order.
+    """
+    dobs = np.asarray(dobs)
+    if dobs.dtype.kind in "US":
+        # datetime64 would also accept "1990" or "1990-04", Person wouldn't
+        bad = np.flatnonzero(np.char.str_len(dobs) != 10)
+        if bad.size:
+            raise ValueError(f"Invalid dob: {dobs[bad[0]]}. Error: expected YYYY-MM-DD")
+    try:
+        days = dobs.astype("datetime64[D]")
+    except ValueError as e:
+        raise ValueError(f"Invalid dob. Error: {str(e)}")
+    n = days.shape[0]
+
+    if genders is not None:
+        np.broadcast_to(np.asarray(genders), (n,))  # raises ValueError if it doesn't match dobs
+
+    months = days.astype("datetime64[M]")
+    yy = days.astype("datetime64[Y]").astype(np.int64) + 1970
+    mm = months.astype(np.int64) % 12 + 1
+    dd = (days - months).astype(np.int64) + 1
+
+    current_year = datetime.now().year
+    bad = np.flatnonzero((yy < 1900) | (yy > current_year))
+    if bad.size:
+        raise ValueError(f"Invalid dob: {days[bad[0]]}. Error: Year must be between 1900 and {current_year}.")
+
+    mulank = digital_root(dd)
+    bhagyank = digital_root(mulank + digital_root(mm) + digital_root(yy))
+
+    # every number going in the Lo Shu grid, zeros are skipped by the comparison below
+    numbers = [
+        yy // 1000, yy // 100 % 10, yy // 10 % 10, yy % 10,
+        mm // 10, mm % 10, dd // 10, dd % 10,
+        mulank, bhagyank,
+    ]
+    if namaanks is not None:
+        numbers.append(np.broadcast_to(np.asarray(namaanks, dtype=np.int64), (n,)))
+
+    grid_numbers = np.arange(1, 10)
+    counts = np.zeros((n, 9), dtype=np.uint8)
+    for column in numbers:
+        counts += column[:, None] == grid_numbers
+
+    mask = ((counts > 0) << np.arange(9, dtype=np.uint16)).sum(axis=1, dtype=np.uint16)
+
+    return {
+        "mulank": mulank.astype(np.uint8),
+        "bhagyank": bhagyank.astype(np.uint8),
+        "counts": counts,
+        "mask": mask,
+        "lucky_mask": get_lucky_mask_lut()[mulank, bhagyank],
+        "planes": PLANE_BITS_BY_MASK[mask],
+        "rajyog": RAJYOG_BITS_BY_MASK[mask],
+    }
+
+
+# ------------------  compatibility kernel (presence masks)  ---------------
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+PLANE_MASKS = {plane: numbers_to_mask(numbers) for plane, numbers in STD_PLANES.items()}
+COMBINED_RAJYOG_MASKS = {
+    "Wealth Rajyog": numbers_to_mask((8, 1, 6)),
+    "Prosperity Rajyog": numbers_to_mask((2, 5, 8)),
+    "Success Rajyog": numbers_to_mask((4, 5, 6)),
+}
+MULANK_STATUS = {5: "Friendly", 3: "Neutral", -5: "Enemy"}
+
+# grid numbers of a mask as set, built in grid order (as flatten_grid) so json lists keep their set order
+GRID_SETS_BY_MASK = [
+    frozenset(num for row in STD_LOSHU_GRID for num in row if mask >> (num - 1) & 1)
+    for mask in range(512)
+]
+
+_mulank_score_lut = None
+
+def get_mulank_score_lut():
+    """Mulank compatibility score indexed by [mulank1][mulank2]."""
+    global _mulank_score_lut
+    if _mulank_score_lut is None:
+        lut = [[0] * 10 for _ in range(10)]
+        for key1 in range(1, 10):
+            compatibility = planets_compatibility[key1]
+            for key2 in range(1, 10):
+                if str(key2) in compatibility["friends"]:
+                    lut[key1][key2] = 5  # Friendly Mulank match
+                elif str(key2) in compatibility["neutral"]:
+                    lut[key1][key2] = 3  # Neutral Mulank match
+                elif str(key2) in compatibility["enemies"]:
+                    lut[key1][key2] = -5  # Enemy Mulank match
+        _mulank_score_lut = lut
+    return _mulank_score_lut
+
+
+# ------------------  one-vs-many compatibility (vectorized)  ---------------
+
+MAX_COMPATIBILITY_SCORE = 5 + 18 + 12 + 6 + 2  # same max_score as get_compatibility_data
+
+POPCOUNT_BY_MASK = np.array([popcount(mask) for mask in range(512)], dtype=np.int16)
+# planes + rajyog + 5/6 points of a combined grid, by its presence mask
+COMBINED_SCORE_BY_MASK = np.array([
+    2 * sum(mask & required == required for required in PLANE_MASKS.values())
+    + 2 * sum(mask & required == required for required in COMBINED_RAJYOG_MASKS.values())
+    + 2 * sum(mask >> (num - 1) & 1 for num in (5, 6))
+    for mask in range(512)
+], dtype=np.int16)
+
+def compute_person_features(dobs, genders=None, names=None):
+    """compute_features with namaank of the names overlaid, as Person(dob, gender, name) would compute them."""
+    namaanks = None
+    if names is not None:
+        namaanks = np.array([calc_namaank(name) for name in names], dtype=np.int64)
+    return compute_features(dobs, genders, namaanks)
+
+def person_signatures(dobs, genders=None, names=None):
+    """Compact (mulanks, masks) arrays of many persons."""
+    features = compute_person_features(dobs, genders, names)
+    return features["mulank"], features["mask"]
+
+def compatibility_scores(mulank, mask, mulanks, masks):
+    """Vectorized total compatibility score (as get_compatibility_data) of one signature against many."""
+    mulank_lut = np.array(get_mulank_score_lut(), dtype=np.int16)
+    return (
+        mulank_lut[mulank, mulanks]
+        + 2 * POPCOUNT_BY_MASK[mask ^ masks]
+        + COMBINED_SCORE_BY_MASK[mask | masks]
+    )
+
+def score_to_percentage(score):
+    return round((score / MAX_COMPATIBILITY_SCORE) * 100, 2)
+
+def rank_compatibility(mulank, mask, mulanks, masks, top_k=10):
+    """[(index, compatibility_percentage)] of the top_k most compatible signatures, ties keep the input order."""
+    scores = compatibility_scores(mulank, mask, np.asarray(mulanks), np.asarray(masks))
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [(int(idx), score_to_percentage(int(scores[idx]))) for idx in order]
+
+
+# ------------------  group compatibility (N persons)  ---------------
+
+MIN_COMPATIBILITY_SCORE = -5  # enemy mulank and nothing else
+# percentage of every possible total score, rounded exactly as get_compatibility_data
+PERCENTAGE_BY_SCORE = np.array(
+    [score_to_percentage(score) for score in range(MIN_COMPATIBILITY_SCORE, 5 + 18 + 12 + 6 + 4 + 1)]
+)
+
+def group_compatibility(dobs, genders=None, names=None):
+    """
+    Pairwise compatibility matrix of N persons (row person vs column person, as get_compatibility_data)
+    plus the combined Lo Shu grid of the whole group with its planes, rajyog and 5/6 completion.
+    """
+    features = compute_person_features(dobs, genders, names)
+    mulanks = features["mulank"].astype(np.intp)
+    masks = features["mask"].astype(np.intp)
+
+    scores = compatibility_scores(mulanks[:, None], masks[:, None], mulanks, masks)
+    percentages = PERCENTAGE_BY_SCORE[scores - MIN_COMPATIBILITY_SCORE]
+
+    n = len(masks)
+    average = None
+    if n > 1:
+        average = round(float(percentages[~np.eye(n, dtype=bool)].mean()), 2)
+
+    # group grid, as combine_grids (max 3 numbers per cell) over everyone
+    group_counts = np.minimum(features["counts"].sum(axis=0), 3)
+    group_mask = int(np.bitwise_or.reduce(masks)) if n else 0
+    completed_planes = [plane for plane, required in PLANE_MASKS.items() if group_mask & required == required]
+
+    return {
+        "matrix": percentages.tolist(),
+        "average_compatibility": average,
+        "group": {
+            "combined_grid": [[[num] * int(group_counts[num - 1]) for num in row] for row in STD_LOSHU_GRID],
+            "planes": PLANE_TUPLES_BY_MASK[group_mask],
+            "completed_planes": completed_planes,
+            "rajyog_found": [name for name, required in COMBINED_RAJYOG_MASKS.items() if group_mask & required == required],
+            "special_numbers": [num for num in [5, 6] if group_mask >> (num - 1) & 1],
+        },
+    }
+
+
 # print( mulank("27-04-2001",True))   
 # print( calc_mulank("28-7-1985",True))   
 
 # Person class to hold individual numerology details
+# ------------------ shared report sections ---------------
+# Report text only depends on the grid presence mask (planes, rajyog) or on (mulank, bhagyank) (personality),
+# so it's built once on first use and shared by every Person with the same numbers, treat it as read only.
+PLANES_PERCENT = {1:"30%", 2:"70%", 3:"100%"}
+PLANES_TEXT = {
+    'Mind': mind_plane_data,
+    'Heart': heart_plane_data,
+    'Practical': practical_plane_data,
+    'Vision': vision_plane_data,
+    'Will': will_plane_data,
+    'Action': action_plane_data,
+}
+_planes_data_by_mask = [None] * 512
+_rajyog_data_by_mask = [None] * 512
+_personality_by_numbers = {}
+
+def get_planes_data_by_mask(mask):
+    """Plane qualities and completion of a grid presence mask."""
+    planes_data = _planes_data_by_mask[mask]
+    if planes_data is None:
+        planes_data = {}
+        for plane, plane_tup in PLANE_TUPLES_BY_MASK[mask].items():
+            planes_data[plane] = PLANES_TEXT[plane].get(plane_tup, {}).copy()
+            planes_data[plane]["completion"] = PLANES_PERCENT.get(plane_tup.count(1) , "0%")
+        _planes_data_by_mask[mask] = planes_data
+    return planes_data
+
+def get_rajyog_data_by_mask(mask):
+    """Rajyog (diagonal planes) data of a grid presence mask."""
+    rajyog_list = _rajyog_data_by_mask[mask]
+    if rajyog_list is None:
+        rajyog_list = _rajyog_data_by_mask[mask] = [rajyog_data.get(key) for key in RAJYOG_KEYS_BY_MASK[mask]]
+    return rajyog_list
+
+def get_overall_personality_data(mulank, bhagyank):
+    """Overall personality section of the report for mulank and bhagyank."""
+    personality = _personality_by_numbers.get((mulank, bhagyank))
+    if personality is None:
+        mulank_data = mulank_quality_det.get(mulank, {})
+        personality = {
+            "mulank": {
+                "mulank_number": mulank,
+                "planet": planet_names[mulank],
+                "quality": mulank_data.get('quality', []),
+                "personality": mulank_data.get('personality', 'No personality information available.'),
+                "career": mulank_data.get('career', 'No career information available.'),
+                "remedies": mulank_data.get('remedy', [])
+            },
+            "bhagyank": {
+                "bhagyank_number": bhagyank,
+                "planet": planet_names[bhagyank],
+                "quality": bhagyank_quality.get(bhagyank, {}).get('quality', 'No quality information available.')
+            },
+            "compatibility": m_b_compatibility.get((mulank, bhagyank), 'No specific compatibility found')
+        }
+        _personality_by_numbers[(mulank, bhagyank)] = personality
+    return personality
+
+
 class Person():
+    """
+    Immutable numerology profile of a person.
+    Only the numbers are stored per instance, grids and report sections are derived from them on access
+    (constant tables are shared class/module attributes).
+    """
+    __slots__ = ("name", "dob", "gender", "mulank", "bhagyank", "kua_num", "namaank",
+                 "lucky_mask", "loshu_counts", "loshu_mask")
+
+    std_l_s_grid = STD_LOSHU_GRID
+    standard_planes = STD_PLANES
+    planes_categories = PLANES_CATEGORIES
+
     def __init__(self, dob:str, gender:str, name="Unnamed"):
-        self.name = name
-        self.dob = dob
-        self.gender = gender
+        _set = object.__setattr__
+        _set(self, "name", name)
+        _set(self, "dob", dob)
+        _set(self, "gender", gender)
         self.init_calc()
-        
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"Person is immutable, can't set '{key}'")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"Person is immutable, can't delete '{key}'")
+
+    def __reduce__(self):
+        return (self.__class__, (self.dob, self.gender, self.name))
+
+    def __eq__(self, other):
+        if not isinstance(other, Person):
+            return NotImplemented
+        return (self.name, self.dob, self.gender) == (other.name, other.dob, other.gender)
+
+    def __hash__(self):
+        return hash((self.name, self.dob, self.gender))
+
     def __str__(self):
         lo_shu_grid_str = self.print_loshu_grid() if self.loshu_grid else "Grid not generated yet"
         return (f"Person: {self.name}\nDOB: {self.dob}\nGender: {self.gender}\n"
@@ -56,42 +516,34 @@ class Person():
                 f"Kua Number: {self.kua_num}\nLo Shu Magic Square Grid:\n{lo_shu_grid_str}")
 
     def init_calc(self):
-        self.mulank , self.bhagyank = calc_mulank(self.dob, bhagyank_also = True)
-        self.kua_num = self.calc_kua_num()
-        self.namaank = self.calc_namaank()
-
-        self.loshu_grid = None
-        self.make_loshu_grid()
-        
-        self.find_lucky_numbers()
-        self.standard_planes = None
-        # self.calculate_identity_planes()
+        _set = object.__setattr__
+        features = get_feature_table().lookup(self.dob)
+        if features is None:
+            # dob outside the precomputed table (or not zero padded), computing from scratch
+            mulank, bhagyank = calc_mulank(self.dob, bhagyank_also = True)
+            _set(self, "mulank", mulank)
+            _set(self, "bhagyank", bhagyank)
+            _set(self, "kua_num", self.calc_kua_num())
+            _set(self, "namaank", self.calc_namaank())
+            self.make_loshu_grid()
+            _set(self, "lucky_mask", calc_lucky_mask(mulank, bhagyank))
+        else:
+            mulank, bhagyank, dob_counts, _, lucky_mask = features
+            _set(self, "mulank", mulank)
+            _set(self, "bhagyank", bhagyank)
+            _set(self, "kua_num", self.calc_kua_num())
+            _set(self, "namaank", self.calc_namaank())
+
+            # overlay the name/gender dependent numbers on the dob counts
+            counts = list(dob_counts)
+            for num in (self.kua_num, self.namaank):
+                if 1 <= num <= 9:
+                    counts[num - 1] += 1
+            self.set_loshu_counts(counts)
+            _set(self, "lucky_mask", lucky_mask)
     
     def calc_namaank(self):
-        if self.name == "Unnamed":
-            return 0
-        self.std_chaldean = {
-            1: ['A', 'I', 'J', 'Q', 'Y'],
-            2: ['B', 'K', 'R'],
-            3: ['C', 'G', 'L', 'S'],
-            4: ['D', 'M', 'T'],
-            5: ['E', 'H', 'N', 'X'],
-            6: ['U', 'V', 'W'],
-            7: ['O', 'Z'],
-            8: ['F', 'P']
-        }
-        total = 0
-        name_upper = self.name.upper()   
-
-        for char in name_upper:
-            for num, letters in self.std_chaldean.items():
-                if char in letters:
-                    total += num
-                    break  # Exit loop once found
-
-        while total > 9:
-            total = sum(int(digit) for digit in str(total))
-        return total
+        return calc_namaank(self.name)
     
     def calc_kua_num(self):
         """ not considering it,influences only 20% or less """
@@ -99,146 +551,71 @@ class Person():
         if self.gender is None :
             raise ValueError("gender must be specified")
         if self.gender == "male" :
-            self.kua_number = 11 - self.bhagyank
+            return 11 - self.bhagyank
         else :
-            self.kua_number = 4 + self.bhagyank
-        return self.kua_number
+            return 4 + self.bhagyank
         
     def find_lucky_numbers(self):
         """ 
         Find lucky numbers based on Mulank and Bhagyank compatibility
         """
-        key1, key2 = self.mulank, self.bhagyank
-        data = planets_compatibility
-        enemies1 = [int(enemy) for enemy in data[key1]["enemies"].split(",")]
-        neutral1 = [int(neutral) for neutral in data[key1]["neutral"].split(",")]
-        enemies2 = [int(enemy) for enemy in data[key2]["enemies"].split(",")]
-        neutral2 = [int(neutral) for neutral in data[key2]["neutral"].split(",")]
+        return [str(num) for num in mask_to_numbers(calc_lucky_mask(self.mulank, self.bhagyank))]
 
-        enemies_sum = set(enemies1 + enemies2)
-        neutral_sum = set(neutral1 + neutral2)
-        # neutral_sum = set([map(int, data[key1]["neutral"].split(",")) + map(int, data[key2]["neutral"].split(","))])
-
-        self.lucky_numbers = [str(num) for num in range(1, 10) if num not in enemies_sum.union(neutral_sum)]
-
-        return self.lucky_numbers
+    @property
+    def lucky_numbers(self):
+        return [str(num) for num in mask_to_numbers(self.lucky_mask)]
     
     def make_loshu_grid(self):
         # Generate the Lo Shu Grid based on DOB and other numbers        
-        self.std_l_s_grid = [[4, 9, 2], [3, 5, 7], [8, 1, 6]]
         dob_numbers = list(map(int, self.dob.replace('-', ''))) + [self.mulank, self.bhagyank, self.kua_num, self.namaank]
         # print(dob_numbers)
         # Count the occurrences of numbers in the standard grid
-        self.planes_num_count = [[0] * 3 for _ in range(3)]
-        std_position = {4: (0, 0), 9: (0, 1), 2: (0, 2), 3: (1, 0), 5: (1, 1), 7: (1, 2), 8: (2, 0), 1: (2, 1), 6: (2, 2)}
-        
+        counts = [0] * 9
         for num in dob_numbers:
-            if num in std_position:
-                i, j = std_position[num]
-                self.planes_num_count[i][j] += 1
-        
-        # print(self.planes_num_count)
-
-        # Create the Lo Shu grid
-        self.loshu_grid = [[[] for _ in range(3)] for _ in range(3)]
-        for num, (i, j) in std_position.items():
-            self.loshu_grid[i][j] = [num] * self.planes_num_count[i][j]
-        
-        # print("Grid:", self.loshu_grid)
+            if 1 <= num <= 9:
+                counts[num - 1] += 1
+        self.set_loshu_counts(counts)
+
+    def set_loshu_counts(self, counts):
+        """Sets the count vector (index num - 1) and presence mask, grids are derived from them."""
+        object.__setattr__(self, "loshu_counts", tuple(counts))
+        object.__setattr__(self, "loshu_mask", numbers_to_mask(num for num in range(1, 10) if counts[num - 1]))
+
+    @property
+    def planes_num_count(self):
+        return [[self.loshu_counts[num - 1] for num in row] for row in STD_LOSHU_GRID]
+
+    @property
+    def loshu_grid(self):
+        return [[[num] * self.loshu_counts[num - 1] for num in row] for row in STD_LOSHU_GRID]
     
         
     def print_loshu_grid(self):
         """Returns the Lo Shu Magic Square grid str """
         return "\n".join(" ".join(map(str, row)) for row in self.loshu_grid)
       
- 
+    # Mind, Heart, Practical planes (horizontal), Vision, Will, Action planes (vertical),
+    # computed on first access and shared by all persons with the same grid presence
+    @property
+    def planes_tuples(self):
+        return PLANE_TUPLES_BY_MASK[self.loshu_mask]
+
+    @property
+    def all_planes_data(self):
+        return get_planes_data_by_mask(self.loshu_mask)
+
+    # Now diagonal planes (Rajyog)
+    @property
+    def rajyog_data_list(self):
+        return get_rajyog_data_by_mask(self.loshu_mask)
+
+    @property
+    def overall_personality(self):
+        return get_overall_personality_data(self.mulank, self.bhagyank)
+
     def calculate_identity_planes(self):
-        self.standard_planes = {
-            'Mind': (4, 9, 2),
-            'Heart': (3, 5, 7),
-            'Practical': (8, 1, 6),
-            'Vision': (4, 3, 8),
-            'Will': (9, 5, 1),
-            'Action': (2, 7, 6),
-        }
-        # percentage of plane completion
-        planes_percent = {1:"30%", 2:"70%", 3:"100%"}
-        
-        planes_tf = [[int(self.planes_num_count[i][j] != 0) for j in range(3)] for i in range(3)]
-        # print(planes_tf)
-        
-        # Mind, Heart, Practical planes (horizontal)
-        mind_tup = tuple(planes_tf[0])
-        heart_tup = tuple(planes_tf[1])
-        practical_tup = tuple(planes_tf[2])
-        
-        mind_data = mind_plane_data.get(mind_tup, {}).copy()
-        heart_data = heart_plane_data.get(heart_tup, {}).copy()
-        practical_data = practical_plane_data.get(practical_tup, {}).copy()
-    
-        mind_data["completion"] =  planes_percent.get(mind_tup.count(1) , "0%")
-        heart_data["completion"] =  planes_percent.get(heart_tup.count(1) , "0%")
-        # print("debug",practical_data, practical_tup)
-        practical_data["completion"] =  planes_percent.get(practical_tup.count(1) , "0%")
-        
-        # print(mind_data,heart_data,practical_data)
-        
-        # Vision, Will, Action planes (vertical)
-        vision_tup = tuple([planes_tf[i][0] for i in range(3)])
-        will_tup = tuple([planes_tf[i][1] for i in range(3)])
-        action_tup = tuple([planes_tf[i][2] for i in range(3)])
-
-        vision_data = vision_plane_data.get(vision_tup, {}).copy()
-        will_data = will_plane_data.get(will_tup, {}).copy()
-        action_data = action_plane_data.get(action_tup, {}).copy()
-    
-        vision_data["completion"] =  planes_percent.get(vision_tup.count(1) , "0%")
-        will_data["completion"] =  planes_percent.get(will_tup.count(1) , "0%")
-        action_data["completion"] =  planes_percent.get(action_tup.count(1) , "0%")
-        
-        # print(vision_data, will_data, action_data)
-        
-        # Now diagonal planes (Rajyog)
-        self.rajyog_data_list = []
-        if planes_tf[2][0] == 1 and planes_tf[2][1] == 1 and planes_tf[2][2] == 1 :
-            self.rajyog_data_list.append(rajyog_data.get((8,1,6)))
-            
-        if planes_tf[1][1] == 1 :
-            if planes_tf[0][0] == 1 and planes_tf[2][2] == 1 :
-                # (2,5,8)
-                self.rajyog_data_list.append(rajyog_data.get((2,5,8)))
-            if planes_tf[0][2] == 1 and planes_tf[2][0] == 1 :
-                # (4,5,6)
-                self.rajyog_data_list.append(rajyog_data.get((4,5,6)))
-                
-        # print(self.rajyog_data_list)
-         
-        # print("Standard Grid:")
-        # for row in self.std_l_s_grid:
-        #     print("  ".join(str(col) for col in row ))
-        # print()
-        
-        # print("Your Lo Shu Grid:")
-        # print(self.print_loshu_grid())
-         
-        # Define plane categories
-        self.planes_categories = ["Mind", "Heart", "Practical", "Vision", "Will", "Action"]
-        self.planes_tuples = {
-            'Mind': mind_tup,
-            'Heart': heart_tup,
-            'Practical': practical_tup,
-            'Vision': vision_tup,
-            'Will': will_tup,
-            'Action': action_tup,
-        }
-        self.all_planes_data = {
-            'Mind': mind_data,
-            'Heart': heart_data,
-            'Practical': practical_data,
-            'Vision': vision_data,
-            'Will': will_data,
-            'Action': action_data,
-        } 
+        """Planes data of the person (sections are lazy, kept for the callers building them upfront)."""
+        return self.all_planes_data
 
 
     # MATHCHING
@@ -256,83 +633,43 @@ class Person():
         score += self.count_unique_grid_numbers(other)
 
         # Step 3: Plane Completion
-        combined_grid = self.combine_grids(other)
-        score += self.evaluate_plane_completion(combined_grid)
+        combined_mask = self.loshu_mask | other.loshu_mask
+        score += self.evaluate_plane_completion(combined_mask)
 
         # Step 4: Presence of Rajyog
-        score += self.check_rajyog_in_combined_grid(combined_grid)
+        score += self.check_rajyog_in_combined_grid(combined_mask)
 
         # Step 5: Presence of Numbers 5 and 6
-        score += self.check_presence_of_5_and_6(combined_grid)
+        score += self.check_presence_of_5_and_6(combined_mask)
 
         return score
 
     def mulank_compatibility(self, other):
         """Assess compatibility based on Mulank."""
-        key1, key2 = self.mulank, other.mulank
-        compatibility = planets_compatibility[key1]
-
-        if str(key2) in compatibility["friends"]:
-            return 5  # Friendly Mulank match
-        elif str(key2) in compatibility["neutral"]:
-            return 3  # Neutral Mulank match
-        elif str(key2) in compatibility["enemies"]:
-            return -5  # Enemy Mulank match
-        return 0
+        return get_mulank_score_lut()[self.mulank][other.mulank]
 
     def count_unique_grid_numbers(self, other):
         """Counts unique numbers present in one grid but not the other."""
-        own_numbers = set(self.flatten_grid(self.loshu_grid))
-        other_numbers = set(self.flatten_grid(other.loshu_grid))
-
-        unique_in_one = own_numbers.symmetric_difference(other_numbers)
-        return 2 * len(unique_in_one)  # 2 points for each unique number
-
-    def evaluate_plane_completion(self, combined_grid):
-        """Evaluate the completion of all standard planes in the combined Lo Shu grid."""
-        score = 0
-        completed_planes = []  # To keep track of which planes are completed
-
-        # Flatten the combined grid to check for the presence of plane numbers
-        flattened_grid = set(self.flatten_grid(combined_grid))
-
-        # Iterate through the planes and check for complete planes
-        for plane, numbers in self.standard_planes.items():
-            if all(num in flattened_grid for num in numbers):
-                score += 2  # 2 points for each complete plane
-                completed_planes.append(plane)  # Track the completed plane
+        return 2 * popcount(self.loshu_mask ^ other.loshu_mask)  # 2 points for each unique number
 
-        return completed_planes, score  # Return the list of completed planes and score
+    def evaluate_plane_completion(self, combined_mask):
+        """Evaluate the completion of all standard planes in the combined Lo Shu grid (presence mask)."""
+        completed_planes = [plane for plane, required in PLANE_MASKS.items() if combined_mask & required == required]
+        return completed_planes, 2 * len(completed_planes)  # 2 points for each complete plane
 
 
     def combine_grids(self, other):
         """Combine two Lo Shu grids into one, ensuring unique values in each cell."""
-        combined_grid = [[[] for _ in range(3)] for _ in range(3)]
+        # Merge two grids cell by cell, limit to max 3 numbers per cell
+        return [
+            [[num] * min(self.loshu_counts[num - 1] + other.loshu_counts[num - 1], 3) for num in row]
+            for row in STD_LOSHU_GRID
+        ]
 
-        # Merge two grids cell by cell 
-        for i in range(3):
-            for j in range(3):
-                combined_values = list(self.loshu_grid[i][j] + other.loshu_grid[i][j])
-                combined_grid[i][j] = combined_values[:3]  # Limit to max 3 numbers per cell
 
-        return combined_grid  # Return the combined Lo Shu grid
-
-
-    def check_rajyog_in_combined_grid(self, combined_grid):
-        """Check for Rajyog patterns in the combined Lo Shu grid."""
-        rajyog_patterns = {
-            "Wealth Rajyog": (8, 1, 6),
-            "Prosperity Rajyog": (2, 5, 8),
-            "Success Rajyog": (4, 5, 6)
-        }
-        flattened_grid = set(self.flatten_grid(combined_grid))
-
-        found_rajyogs = []  # To track which Rajyog patterns are found
-        for rajyog_name, pattern in rajyog_patterns.items():
-            if all(num in flattened_grid for num in pattern):
-                found_rajyogs.append(rajyog_name)  # Track the found Rajyog pattern
-
-        return found_rajyogs  # Return the list of found Rajyogs
+    def check_rajyog_in_combined_grid(self, combined_mask):
+        """Check for Rajyog patterns in the combined Lo Shu grid (presence mask)."""
+        return [name for name, required in COMBINED_RAJYOG_MASKS.items() if combined_mask & required == required]
 
 
     def flatten_grid(self, grid):
@@ -340,12 +677,10 @@ class Person():
         return [num for row in grid for cell in row for num in cell]
 
 
-    def check_presence_of_5_and_6(self, combined_grid):
-        """Check for the presence of numbers 5 and 6 in the combined grid."""
-        flattened_grid = set(self.flatten_grid(combined_grid))
-
-        if 5 in flattened_grid :
-            if 6 in flattened_grid:
+    def check_presence_of_5_and_6(self, combined_mask):
+        """Check for the presence of numbers 5 and 6 in the combined grid (presence mask)."""
+        if combined_mask >> 4 & 1 :
+            if combined_mask >> 5 & 1:
                 return 4
             return 2  
         return 0
@@ -358,17 +693,17 @@ class Person():
         mulank_score = self.mulank_compatibility(other)
 
         # Step 2: Combine Lo Shu Grids and calculate incoming/outgoing numbers
-        combined_grid = self.combine_grids(other)
+        combined_mask = self.loshu_mask | other.loshu_mask
         incoming_outgoing_score = self.count_unique_grid_numbers(other)
 
         # Step 3: Evaluate plane completion in the combined grid
-        plane_completion_score = self.evaluate_plane_completion(combined_grid)
+        plane_completion_score = self.evaluate_plane_completion(combined_mask)
 
         # Step 4: Check for Rajyog patterns in the combined grid
-        rajyog_score = self.check_rajyog_in_combined_grid(combined_grid)
+        rajyog_score = self.check_rajyog_in_combined_grid(combined_mask)
 
         # Step 5: Check for the presence of numbers 5 and 6
-        special_numbers_score = self.check_presence_of_5_and_6(combined_grid)
+        special_numbers_score = self.check_presence_of_5_and_6(combined_mask)
 
         # Calculate the total score
         total_score = (
@@ -388,85 +723,6 @@ class Person():
         return round(compatibility_percentage, 2)
 
 
-# ------------------  for compatibility, implementing it in client side,,  ---------------
-    def get_compatibility_details_json(self, other):
-        if not self.standard_planes :
-            self.calculate_identity_planes()
-        """Return detailed matching compatibility data in JSON format."""
-
-        # Step 1: Mulank Compatibility
-        mulank_score = self.mulank_compatibility(other)
-        mulank_status = (
-            "Friendly" if mulank_score == 5 
-            else "Neutral" if mulank_score == 3 
-            else "Enemy" if mulank_score == -5 
-            else "No Relationship"
-        )
-
-        # Step 2: Incoming and Outgoing Unique Numbers
-        flattened_self = set(self.flatten_grid(self.loshu_grid))
-        flattened_other = set(self.flatten_grid(other.loshu_grid))
-        unique_to_self = flattened_self - flattened_other
-        unique_to_other = flattened_other - flattened_self
-        incoming_outgoing_score = 2 * (len(unique_to_self) + len(unique_to_other))
-
-        # Step 3: Combine Lo Shu Grids and Evaluate Planes
-        combined_grid = self.combine_grids(other)
-        completed_planes, plane_completion_score = self.evaluate_plane_completion(combined_grid)
-
-        # Step 4: Check for Rajyog patterns in the combined grid
-        rajyog_planes = self.check_rajyog_in_combined_grid(combined_grid)
-        rajyog_score = len(rajyog_planes) * 2
-
-        # Step 5: Check for the presence of numbers 5 and 6
-        special_numbers_present = [num for num in [5, 6] if num in self.flatten_grid(combined_grid)]
-        special_numbers_score = len(special_numbers_present) * 2
-
-        # Total Score and Max Score for Compatibility Percentage
-        total_score = (
-            mulank_score + incoming_outgoing_score +
-            plane_completion_score + rajyog_score + special_numbers_score
-        )
-        max_score = 5 + 18 + 12 + 6 + 2
-        compatibility_percentage = round((total_score / max_score) * 100, 2)
-
-        # Prepare JSON data
-        compatibility_data = {
-            "mulank": {
-                "person1_mulank": self.mulank,
-                "person2_mulank": other.mulank,
-                "status": mulank_status,
-                "score": mulank_score
-            },
-            "unique_numbers": {
-                "unique_to_person1": list(unique_to_self),
-                "unique_to_person2": list(unique_to_other),
-                "score": incoming_outgoing_score
-            },
-            "planes": {
-                "completed_planes": completed_planes,
-                "score": plane_completion_score
-            },
-            "rajyog": {
-                "planes_found": rajyog_planes,
-                "score": rajyog_score
-            },
-            "special_numbers": {
-                "present": special_numbers_present,
-                "score": special_numbers_score
-            },
-            "grids": {
-                "person1_grid": self.loshu_grid,
-                "person2_grid": other.loshu_grid,
-                "combined_grid": combined_grid
-            },
-            "compatibility_percentage": compatibility_percentage
-        }
-
-        # Return the data as JSON
-        return json.dumps(compatibility_data)
-    
-    
     def compatibility_data_json(self, other):
         """Compatibility data between two persons ."""
         
@@ -507,37 +763,30 @@ class Person():
 
 
 # ------------------  for compatibility, implementing it in client side,,  ---------------
-    def get_compatibility_details_json(self, other):
-        if not self.standard_planes :
-            self.calculate_identity_planes()
-        """Return detailed matching compatibility data in JSON format."""
+    def get_compatibility_data(self, other):
+        """Return detailed matching compatibility data."""
 
         # Step 1: Mulank Compatibility
         mulank_score = self.mulank_compatibility(other)
-        mulank_status = (
-            "Friendly" if mulank_score == 5 
-            else "Neutral" if mulank_score == 3 
-            else "Enemy" if mulank_score == -5 
-            else "No Relationship"
-        )
+        mulank_status = MULANK_STATUS.get(mulank_score, "No Relationship")
 
         # Step 2: Incoming and Outgoing Unique Numbers
-        flattened_self = set(self.flatten_grid(self.loshu_grid))
-        flattened_other = set(self.flatten_grid(other.loshu_grid))
-        unique_to_self = flattened_self - flattened_other
-        unique_to_other = flattened_other - flattened_self
-        incoming_outgoing_score = 2 * (len(unique_to_self) + len(unique_to_other))
+        own_numbers = GRID_SETS_BY_MASK[self.loshu_mask]
+        other_numbers = GRID_SETS_BY_MASK[other.loshu_mask]
+        unique_to_self = own_numbers - other_numbers
+        unique_to_other = other_numbers - own_numbers
+        incoming_outgoing_score = self.count_unique_grid_numbers(other)
 
         # Step 3: Combine Lo Shu Grids and Evaluate Planes
-        combined_grid = self.combine_grids(other)
-        completed_planes, plane_completion_score = self.evaluate_plane_completion(combined_grid)
+        combined_mask = self.loshu_mask | other.loshu_mask
+        completed_planes, plane_completion_score = self.evaluate_plane_completion(combined_mask)
 
         # Step 4: Check for Rajyog patterns in the combined grid
-        rajyog_planes = self.check_rajyog_in_combined_grid(combined_grid)
+        rajyog_planes = self.check_rajyog_in_combined_grid(combined_mask)
         rajyog_score = len(rajyog_planes) * 2
 
         # Step 5: Check for the presence of numbers 5 and 6
-        special_numbers_present = [num for num in [5, 6] if num in self.flatten_grid(combined_grid)]
+        special_numbers_present = [num for num in [5, 6] if combined_mask >> (num - 1) & 1]
         special_numbers_score = len(special_numbers_present) * 2
 
         # Total Score and Max Score for Compatibility Percentage
@@ -549,7 +798,7 @@ class Person():
         compatibility_percentage = round((total_score / max_score) * 100, 2)
 
         # Prepare JSON data
-        compatibility_data = {
+        return {
             "mulank": {
                 "person1_mulank": self.mulank,
                 "person2_mulank": other.mulank,
@@ -576,13 +825,14 @@ class Person():
             "grids": {
                 "person1_grid": self.loshu_grid,
                 "person2_grid": other.loshu_grid,
-                "combined_grid": combined_grid
+                "combined_grid": self.combine_grids(other)
             },
             "compatibility_percentage": compatibility_percentage
         }
 
-        # Return the data as JSON
-        return json.dumps(compatibility_data)
+    def get_compatibility_details_json(self, other):
+        """Return detailed matching compatibility data in JSON format."""
+        return json.dumps(self.get_compatibility_data(other))
 
 
 
@@ -626,7 +876,7 @@ class Person():
     def get_planes_data(self):
         # Append Rajyog data if available
         prt = "\n"
-        if hasattr(self, "rajyog_data_list") and self.rajyog_data_list :
+        if self.rajyog_data_list :
             # prt = "\nRajyog :\n" if self.rajyog_data_list else "\n"
             for raj_data in self.rajyog_data_list:
                 prt += ("Rajyog:" + raj_data["rajyog"])
@@ -655,8 +905,6 @@ class Person():
         return prt
         
     def to_str(self) -> str:
-        if not self.standard_planes :
-            self.calculate_identity_planes()
         return (
             f"{whats_numerology}\n\n"
             f"Person: {self.name}\nDOB: {self.dob}\nGender: {self.gender}\nMulank: {self.mulank}\nBhagyank: {self.bhagyank}\n"
@@ -675,11 +923,10 @@ class Person():
             f.write(self.to_str())
 
 
-    def to_json(self):
-        if not self.standard_planes :
-            self.calculate_identity_planes()
+    def get_all_data(self):
+        """Report data of the person (as stored in report_data)."""
         # Prepare the data structure
-        data = {
+        return {
             "person_info": {
                 "name": self.name,
                 "dob": self.dob,
@@ -690,22 +937,7 @@ class Person():
                 "lucky_numbers": self.lucky_numbers,
             },
             "loshu_grid": self.loshu_grid,
-            "overall_personality": {
-                "mulank": {
-                    "mulank_number": self.mulank,
-                    "planet": planet_names[self.mulank],
-                    "quality": mulank_quality_det.get(self.mulank, {}).get('quality', []),
-                    "personality": mulank_quality_det.get(self.mulank, {}).get('personality', 'No personality information available.'),
-                    "career": mulank_quality_det.get(self.mulank, {}).get('career', 'No career information available.'),
-                    "remedies": mulank_quality_det.get(self.mulank, {}).get('remedy', [])
-                },
-                "bhagyank": {
-                    "bhagyank_number": self.bhagyank,
-                    "planet": planet_names[self.bhagyank],
-                    "quality": bhagyank_quality.get(self.bhagyank, {}).get('quality', 'No quality information available.')
-                },
-                "compatibility": m_b_compatibility.get((self.mulank, self.bhagyank), 'No specific compatibility found')
-            },
+            "overall_personality": self.overall_personality,
             "planes_data": {
                 "planes": [
                     {
@@ -721,15 +953,243 @@ class Person():
                         "completion": rajyog["elements"],
                         "qualities": rajyog["qualities"]
                     } for rajyog in self.rajyog_data_list
-                ] if hasattr(self, "rajyog_data_list") and self.rajyog_data_list else []
+                ] if self.rajyog_data_list else []
             }
         }
-        # return data
+
+    def get_compact_data(self):
+        """Computed features only (as stored in SubReport.report_data), see hydrate_report_data."""
+        return {
+            "kb_version": REPORT_KB_VERSION,
+            "person_info": {
+                "name": self.name,
+                "dob": self.dob,
+                "gender": self.gender,
+                "namaank":self.namaank,
+                "mulank": self.mulank,
+                "bhagyank": self.bhagyank,
+                "lucky_numbers": self.lucky_numbers,
+            },
+            "loshu_counts": list(self.loshu_counts),
+            "planes": {category: list(self.planes_tuples[category]) for category in self.planes_categories},
+            "rajyog": [list(key) for key in RAJYOG_KEYS_BY_MASK[self.loshu_mask]],
+        }
+
+    def to_json(self):
         # Return JSON response
-        return json.dumps(data)
+        return json.dumps(self.get_all_data())
         # return json.dumps(data, indent=1)
 
  
+# ------------------ compact report storage ---------------
+# Stored reports keep only the computed numbers, the text comes from the in-memory data tables when read,
+# so text corrections apply to old reports too. Bump the version if the stored features change meaning.
+REPORT_KB_VERSION = 1
+
+def hydrate_report_data(report_data):
+    """
+    Full report (as Person.get_all_data) from stored report_data,
+    reports stored before the compact format (no kb_version) are already full and returned as they are.
+    """
+    if not report_data or "kb_version" not in report_data:
+        return report_data
+
+    person_info = report_data["person_info"]
+    counts = report_data["loshu_counts"]
+
+    planes = []
+    for category in PLANES_CATEGORIES:
+        plane_tup = tuple(report_data["planes"][category])
+        planes.append({
+            "plane_name": category,
+            "plane_tuple": plane_tup,
+            "completion": PLANES_PERCENT.get(plane_tup.count(1) , "0%"),
+            "qualities": PLANES_TEXT[category].get(plane_tup, {})['qualities']
+        })
+
+    rajyog_list = [rajyog_data.get(tuple(key)) for key in report_data["rajyog"]]
+
+    return {
+        "person_info": dict(person_info),
+        "loshu_grid": [[[num] * counts[num - 1] for num in row] for row in STD_LOSHU_GRID],
+        "overall_personality": get_overall_personality_data(person_info["mulank"], person_info["bhagyank"]),
+        "planes_data": {
+            "planes": planes,
+            "rajyog": [
+                {
+                    "rajyog": rajyog["rajyog"],
+                    "completion": rajyog["elements"],
+                    "qualities": rajyog["qualities"]
+                } for rajyog in rajyog_list
+            ]
+        }
+    }
+
+
+def compact_match_data(person1, person2):
+    """Compact (stored) form of person1.get_compatibility_data(person2): both signatures and the scores."""
+    combined_mask = person1.loshu_mask | person2.loshu_mask
+    _, plane_completion_score = person1.evaluate_plane_completion(combined_mask)
+    return {
+        "kb_version": REPORT_KB_VERSION,
+        "person1": {"mulank": person1.mulank, "loshu_counts": list(person1.loshu_counts)},
+        "person2": {"mulank": person2.mulank, "loshu_counts": list(person2.loshu_counts)},
+        "scores": {
+            "mulank": person1.mulank_compatibility(person2),
+            "unique_numbers": person1.count_unique_grid_numbers(person2),
+            "planes": plane_completion_score,
+            "rajyog": 2 * len(person1.check_rajyog_in_combined_grid(combined_mask)),
+            "special_numbers": 2 * popcount(combined_mask >> 4 & 0b11),
+        },
+    }
+
+def hydrate_match_data(match_data):
+    """
+    Full match data (as Person.get_compatibility_data) from stored match_data,
+    matches stored before the compact format (no kb_version) are returned as they are.
+    """
+    if not match_data or "kb_version" not in match_data:
+        return match_data
+
+    counts1 = match_data["person1"]["loshu_counts"]
+    counts2 = match_data["person2"]["loshu_counts"]
+    mask1 = numbers_to_mask(num for num in range(1, 10) if counts1[num - 1])
+    mask2 = numbers_to_mask(num for num in range(1, 10) if counts2[num - 1])
+    combined_mask = mask1 | mask2
+    scores = match_data["scores"]
+
+    return {
+        "mulank": {
+            "person1_mulank": match_data["person1"]["mulank"],
+            "person2_mulank": match_data["person2"]["mulank"],
+            "status": MULANK_STATUS.get(scores["mulank"], "No Relationship"),
+            "score": scores["mulank"]
+        },
+        "unique_numbers": {
+            "unique_to_person1": list(GRID_SETS_BY_MASK[mask1] - GRID_SETS_BY_MASK[mask2]),
+            "unique_to_person2": list(GRID_SETS_BY_MASK[mask2] - GRID_SETS_BY_MASK[mask1]),
+            "score": scores["unique_numbers"]
+        },
+        "planes": {
+            "completed_planes": [plane for plane, required in PLANE_MASKS.items() if combined_mask & required == required],
+            "score": scores["planes"]
+        },
+        "rajyog": {
+            "planes_found": [name for name, required in COMBINED_RAJYOG_MASKS.items() if combined_mask & required == required],
+            "score": scores["rajyog"]
+        },
+        "special_numbers": {
+            "present": [num for num in [5, 6] if combined_mask >> (num - 1) & 1],
+            "score": scores["special_numbers"]
+        },
+        "grids": {
+            "person1_grid": [[[num] * counts1[num - 1] for num in row] for row in STD_LOSHU_GRID],
+            "person2_grid": [[[num] * counts2[num - 1] for num in row] for row in STD_LOSHU_GRID],
+            "combined_grid": [
+                [[num] * min(counts1[num - 1] + counts2[num - 1], 3) for num in row]
+                for row in STD_LOSHU_GRID
+            ]
+        },
+        "compatibility_percentage": score_to_percentage(sum(scores.values()))
+    }
+
+
+def swap_match_data(match_data):
+    """Full match data seen from the other person (person2.get_compatibility_data(person1)), mulank score is directional."""
+    mulank1 = match_data["mulank"]["person1_mulank"]
+    mulank2 = match_data["mulank"]["person2_mulank"]
+    mulank_score = get_mulank_score_lut()[mulank2][mulank1]
+    unique_numbers = match_data["unique_numbers"]
+    grids = match_data["grids"]
+    total_score = mulank_score + sum(match_data[key]["score"] for key in ("unique_numbers", "planes", "rajyog", "special_numbers"))
+
+    return {
+        "mulank": {
+            "person1_mulank": mulank2,
+            "person2_mulank": mulank1,
+            "status": MULANK_STATUS.get(mulank_score, "No Relationship"),
+            "score": mulank_score
+        },
+        "unique_numbers": {
+            "unique_to_person1": unique_numbers["unique_to_person2"],
+            "unique_to_person2": unique_numbers["unique_to_person1"],
+            "score": unique_numbers["score"]
+        },
+        "planes": match_data["planes"],
+        "rajyog": match_data["rajyog"],
+        "special_numbers": match_data["special_numbers"],
+        "grids": {
+            "person1_grid": grids["person2_grid"],
+            "person2_grid": grids["person1_grid"],
+            "combined_grid": grids["combined_grid"]
+        },
+        "compatibility_percentage": score_to_percentage(total_score)
+    }
+
+
+# ------------------ process local flyweight cache ---------------
+class PersonCache():
+    """
+    Size bounded LRU of Person objects and their report data keyed by (dob, gender, name), shared by all requests
+    of a worker. The name is part of the key as namaank (and so the grid and lucky numbers) depends on it,
+    cached objects are shared so callers must not mutate them.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # (dob, gender, name) -> [Person, report_data or None]
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_entry(self, dob, gender, name):
+        key = (dob, gender, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # build outside the lock, a concurrent miss on the same key just builds it twice
+        entry = [Person(dob, gender, name), None]
+        with self._lock:
+            entry = self._entries.setdefault(key, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def get_person(self, dob, gender, name="Unnamed"):
+        """Shared (immutable) Person of the dob, gender and name."""
+        return self._get_entry(dob, gender, name)[0]
+
+    def get_report_data(self, dob, gender, name="Unnamed"):
+        """Report data of the person, person_info is copied (callers overlay the stored person name on it)."""
+        entry = self._get_entry(dob, gender, name)
+        report_data = entry[1]
+        if report_data is None:
+            report_data = entry[1] = entry[0].get_all_data()
+        return {**report_data, "person_info": {**report_data["person_info"]}}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
 if __name__ == "__main__":
     # pass
  